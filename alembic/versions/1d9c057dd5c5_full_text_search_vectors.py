@@ -0,0 +1,84 @@
+"""full text search vectors
+
+Revision ID: 1d9c057dd5c5
+Revises: b64ff13e0fc8
+Create Date: 2026-10-18 15:41:37.902114
+
+tsvector columns on blogs (title > excerpt > content weights) and comments, each with a GIN index,
+for the ranked full text mode of /search. Built without locking the tables for the whole migration:
+- the columns are plain and nullable, adding them only changes the catalog (a STORED generated column
+  would rewrite the table under an ACCESS EXCLUSIVE lock)
+- a BEFORE INSERT/UPDATE trigger fills them from then on (same triggers as app.db.models.search_vector_trigger)
+- existing rows are backfilled in primary key batches of BACKFILL_BATCH, each committed on its own
+- the GIN indexes are built CONCURRENTLY once the rows are filled
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d9c057dd5c5'
+down_revision: Union[str, Sequence[str], None] = 'b64ff13e0fc8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH = 5000
+
+# (table, primary key, tsvector expression over NEW, columns it's made of)
+SEARCH_VECTORS = [
+    ("blogs", "blog_id",
+     "setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') || "
+     "setweight(to_tsvector('english', coalesce(NEW.excerpt, '')), 'B') || "
+     "setweight(to_tsvector('english', coalesce(NEW.content, '')), 'C')",
+     "title, excerpt, content"),
+    ("comments", "comment_id", "to_tsvector('english', coalesce(NEW.content, ''))", "content"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, _, expression, columns in SEARCH_VECTORS:
+        op.add_column(table, sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+        op.execute(sa.text(f"""
+            CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {expression};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """))
+        op.execute(sa.text(f"""
+            CREATE TRIGGER {table}_search_vector_update BEFORE INSERT OR UPDATE OF {columns} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update()
+        """))
+
+    with op.get_context().autocommit_block():
+        # the trigger is committed, rows written from here on are filled by it; each batch is its own transaction
+        bind = op.get_bind()
+        for table, key, expression, _ in SEARCH_VECTORS:
+            max_id = bind.execute(sa.text(f"SELECT max({key}) FROM {table}")).scalar() or 0
+            backfill = sa.text(f"""
+                UPDATE {table} SET search_vector = {expression.replace("NEW.", "")}
+                WHERE {key} > :low AND {key} <= :high AND search_vector IS NULL
+            """)
+            for low in range(0, max_id, BACKFILL_BATCH):
+                bind.execute(backfill, {"low": low, "high": low + BACKFILL_BATCH})
+
+        op.create_index("ix_blogs_search_vector", "blogs", ["search_vector"],
+                        postgresql_using="gin", postgresql_concurrently=True, if_not_exists=True)
+        op.create_index("ix_comments_search_vector", "comments", ["search_vector"],
+                        postgresql_using="gin", postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_comments_search_vector", table_name="comments", if_exists=True)
+    op.drop_index("ix_blogs_search_vector", table_name="blogs", if_exists=True)
+    for table, _, _, _ in SEARCH_VECTORS:
+        op.execute(sa.text(f"DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table}"))
+        op.execute(sa.text(f"DROP FUNCTION IF EXISTS {table}_search_vector_update()"))
+        op.drop_column(table, "search_vector")
@@ -0,0 +1,61 @@
+"""user sessions
+
+Revision ID: 622ab3276f9a
+Revises: d56db397ca21
+Create Date: 2026-10-18 19:41:07.152903
+
+Refresh tokens move from users.refresh_token (one plaintext token per user) to user_sessions,
+one row per signed-in device holding the SHA-256 of its current and previous token. The table is
+new and empty, so its indexes are built with it. The tokens still in users.refresh_token are cleared:
+they were readable by anyone who could read the table, so they aren't carried over, every device
+signs in with Google once more. The column stays (nullable), a downgrade can't bring the tokens back.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '622ab3276f9a'
+down_revision: Union[str, Sequence[str], None] = 'd56db397ca21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_sessions",
+        sa.Column("session_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("token_hash", sa.String(length=64), nullable=False),
+        sa.Column("previous_token_hash", sa.String(length=64), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        sa.Column("last_used_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        sa.Column("rotated_at", sa.TIMESTAMP(), nullable=True),
+        sa.Column("expires_at", sa.TIMESTAMP(), nullable=False),
+        sa.Column("revoked_at", sa.TIMESTAMP(), nullable=True),
+        sa.Column("revoke_reason", sa.String(length=20), nullable=True),
+        sa.Column("ip_address", sa.String(length=45), nullable=True),
+        sa.Column("user_agent", sa.Text(), nullable=True),
+        sa.Column("device_id", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.user_id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("session_id"),
+    )
+    op.create_index("ix_user_sessions_token_hash", "user_sessions", ["token_hash"], unique=True)
+    op.create_index(
+        "ix_user_sessions_previous_token_hash", "user_sessions", ["previous_token_hash"],
+        postgresql_where=sa.text("previous_token_hash IS NOT NULL"),
+    )
+    op.create_index("ix_user_sessions_user_id", "user_sessions", ["user_id"])
+    op.create_index(
+        "ix_user_sessions_revoked_at", "user_sessions", ["revoked_at"],
+        postgresql_where=sa.text("revoked_at IS NOT NULL"),
+    )
+    op.execute("UPDATE users SET refresh_token = NULL WHERE refresh_token IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_sessions")
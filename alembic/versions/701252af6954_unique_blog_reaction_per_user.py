@@ -0,0 +1,54 @@
+"""unique blog reaction per user
+
+Revision ID: 701252af6954
+Revises: 1d9c057dd5c5
+Create Date: 2026-10-18 16:12:48.530917
+
+One row per (blog_id, user_id) in blog_reactions. Duplicates left behind by the old
+read-modify-write toggle are removed first (the newest row of each pair is kept) and the
+likes/dislikes of their blogs recounted, then the plain lookup index from b64ff13e0fc8 is
+replaced by the unique constraint, which serves the same lookups and is the ON CONFLICT target of crud.create_or_update_reaction.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '701252af6954'
+down_revision: Union[str, Sequence[str], None] = '1d9c057dd5c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.text("CREATE TEMPORARY TABLE deduplicated_blogs (blog_id integer PRIMARY KEY) ON COMMIT DROP"))
+    op.execute(sa.text("""
+        WITH removed AS (
+            DELETE FROM blog_reactions older
+            USING blog_reactions newer
+            WHERE older.blog_id = newer.blog_id
+              AND older.user_id = newer.user_id
+              AND older.reaction_id < newer.reaction_id
+            RETURNING older.blog_id
+        )
+        INSERT INTO deduplicated_blogs SELECT DISTINCT blog_id FROM removed
+    """))
+    # the likes/dislikes of those blogs counted the removed rows too: recount them from what is left
+    # (separate statement, a statement in the same WITH would still see the deleted rows)
+    op.execute(sa.text("""
+        UPDATE blogs SET
+            likes = (SELECT count(*) FROM blog_reactions r WHERE r.blog_id = blogs.blog_id AND r.reaction_type = 'LIKE'),
+            dislikes = (SELECT count(*) FROM blog_reactions r WHERE r.blog_id = blogs.blog_id AND r.reaction_type = 'DISLIKE')
+        WHERE blog_id IN (SELECT blog_id FROM deduplicated_blogs)
+    """))
+    op.create_unique_constraint("uq_blog_reactions_blog_id_user_id", "blog_reactions", ["blog_id", "user_id"])
+    op.drop_index("ix_blog_reactions_blog_id_user_id", table_name="blog_reactions", if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_blog_reactions_blog_id_user_id", "blog_reactions", ["blog_id", "user_id"])
+    op.drop_constraint("uq_blog_reactions_blog_id_user_id", "blog_reactions", type_="unique")
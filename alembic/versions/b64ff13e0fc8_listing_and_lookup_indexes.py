@@ -0,0 +1,68 @@
+"""listing and lookup indexes
+
+Revision ID: b64ff13e0fc8
+Revises:
+Create Date: 2026-10-18 15:02:11.418205
+
+Composite and partial indexes for the hot crud queries:
+- get_blogs (GET /blogs): deleted_at IS NULL, optional visibility/is_hidden, ORDER BY updated_at DESC, blog_id DESC
+- get_comments_by_blog: blog_id
+- get_user_reaction: (blog_id, user_id)
+- get_login_history: user_id
+
+Built CONCURRENTLY so a live database keeps taking writes while they build.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b64ff13e0fc8'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_blogs_listing", "blogs",
+            [sa.text("updated_at DESC"), sa.text("blog_id DESC")],
+            postgresql_where=sa.text("deleted_at IS NULL"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_blogs_visibility_listing", "blogs",
+            ["visibility", "is_hidden", sa.text("updated_at DESC"), sa.text("blog_id DESC")],
+            postgresql_where=sa.text("deleted_at IS NULL"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_comments_blog_id_created_at", "comments", ["blog_id", "created_at"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_blog_reactions_blog_id_user_id", "blog_reactions", ["blog_id", "user_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_login_history_user_id_login_timestamp", "login_history",
+            ["user_id", sa.text("login_timestamp DESC")],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table in [
+            ("ix_login_history_user_id_login_timestamp", "login_history"),
+            ("ix_blog_reactions_blog_id_user_id", "blog_reactions"),
+            ("ix_comments_blog_id_created_at", "comments"),
+            ("ix_blogs_visibility_listing", "blogs"),
+            ("ix_blogs_listing", "blogs"),
+        ]:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,56 @@
+"""threaded comments
+
+Revision ID: d56db397ca21
+Revises: 701252af6954
+Create Date: 2026-10-18 17:05:12.284611
+
+comments.parent_comment_id becomes a real foreign key (replies go with their parent), plus the
+indexes crud.get_comment_threads walks: top-level comments of a blog in (created_at, comment_id)
+order, and the replies of a comment. Parents that no longer exist are cleared first, the key is
+added NOT VALID and validated separately so the table isn't locked against writes while it's checked.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd56db397ca21'
+down_revision: Union[str, Sequence[str], None] = '701252af6954'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.text("""
+        UPDATE comments SET parent_comment_id = NULL
+        WHERE parent_comment_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM comments parent WHERE parent.comment_id = comments.parent_comment_id)
+    """))
+    op.create_foreign_key(
+        "comments_parent_comment_id_fkey", "comments", "comments",
+        ["parent_comment_id"], ["comment_id"], ondelete="CASCADE", postgresql_not_valid=True,
+    )
+
+    with op.get_context().autocommit_block():
+        # own transaction: validating only takes a SHARE UPDATE EXCLUSIVE lock, the ADD above is already committed
+        op.execute(sa.text("ALTER TABLE comments VALIDATE CONSTRAINT comments_parent_comment_id_fkey"))
+        op.create_index(
+            "ix_comments_blog_threads", "comments", ["blog_id", "created_at", "comment_id"],
+            postgresql_where=sa.text("parent_comment_id IS NULL AND deleted_at IS NULL"),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_comments_parent_comment_id", "comments", ["parent_comment_id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_comments_parent_comment_id", table_name="comments", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_comments_blog_threads", table_name="comments", postgresql_concurrently=True, if_exists=True)
+    op.drop_constraint("comments_parent_comment_id_fkey", "comments", type_="foreignkey")
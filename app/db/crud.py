@@ -1,14 +1,27 @@
 # CRUD functions for FastAPI with SQLAlchemy
 
+import re
+from datetime import datetime
+from typing import Optional
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import Float, Integer, bindparam, cast, column, desc, func, literal, select, text, tuple_, union_all
+from sqlalchemy.orm import Session, aliased, joinedload, load_only, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from app.db import models, schemas
+from app.db.view_counter import view_counter
+from app.utils.ttl_cache import TTLCache
 from passlib.context import CryptContext
+import os
 
 #pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+BLOG_LIST_CACHE_SIZE = int(os.getenv("BLOG_LIST_CACHE_SIZE", "256")) # pages
+BLOG_LIST_CACHE_TTL_SECONDS = float(os.getenv("BLOG_LIST_CACHE_TTL_SECONDS", "30"))
+
 
 def create_user(db: Session, user: schemas.UserCreate):
     try:
@@ -41,6 +54,20 @@ def get_user_by_id(db: Session, user_id: int):
     except SQLAlchemyError:
         raise HTTPException(status_code=500, detail="Database error")
 
+# Cached UserResponse by user_id, for reads that need more than the access token claims.
+# Entries are dropped by every user update below; other workers see a change after USER_CACHE_TTL_SECONDS at most.
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+def get_user_cached(db: Session, user_id: int) -> Optional[schemas.UserResponse]:
+    user = user_cache.get(user_id)
+    if user is None:
+        db_user = get_user_by_id(db, user_id)
+        if db_user is None:
+            return None
+        user = schemas.UserResponse.model_validate(db_user)
+        user_cache.set(user_id, user)
+    return user
+
 def get_user_by_email(db: Session, email: str):
     try:
         return db.query(models.User).filter(models.User.email == email).first()
@@ -58,6 +85,7 @@ def update_user(db: Session, user_id: int, updates: schemas.UserCreate):
             setattr(db_user, key, value)
 
         db.commit()
+        user_cache.invalidate(user_id)
         db.refresh(db_user)
         return db_user
     except SQLAlchemyError:
@@ -72,6 +100,7 @@ def update_user_refresh_token(db: Session, user_id: int, refresh_token: str):
 
         db_user.refresh_token = refresh_token  # type: ignore
         db.commit()
+        user_cache.invalidate(user_id)
         db.refresh(db_user)
         return db_user
     except SQLAlchemyError:
@@ -91,6 +120,7 @@ def update_user_role(db: Session, user_id: int, new_role: str):
 
         db_user.user_type = new_role # type: ignore
         db.commit()
+        user_cache.invalidate(user_id)
         db.refresh(db_user)  # Ensure the session reflects the updated object
         return db_user
 
@@ -109,6 +139,7 @@ def delete_user(db: Session, user_id: int):
 
         db.delete(db_user)
         db.commit()
+        user_cache.invalidate(user_id)
     except SQLAlchemyError:
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to delete user")
@@ -128,15 +159,90 @@ def create_blog(db: Session, blog: schemas.BlogCreate, author_id: int):
 
 def get_blog(db: Session, blog_id: int):
     try:
-        #return db.query(models.Blog).filter(models.Blog.blog_id == blog_id).first()
         blog = db.query(models.Blog).filter(models.Blog.blog_id == blog_id).first()
-        blog.num_views += 1 # type: ignore
-        db.commit()
+        if blog is None:
+            return None
+        # the view is written later in a batch (see view_counter), reading stays a plain SELECT
+        view_counter.record(blog_id)
+        # include views that aren't flushed yet, without marking the row dirty
+        set_committed_value(blog, "num_views", (blog.num_views or 0) + view_counter.pending(blog_id))
         return blog
     except SQLAlchemyError:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Database error while updating blog.num_views")
+        raise HTTPException(status_code=500, detail="Database error")
     
+# What the blog detail ETag is made of: every field of schemas.BlogSpecificResponse and of its author but content
+# (big, and an edit bumps updated_at, see events.py), num_views and the caller's reaction (see routers.blogs.blog_etag)
+BLOG_ETAG_COLUMNS = tuple(getattr(models.Blog, field) for field in schemas.BlogSpecificResponse.model_fields
+                          if field not in ("content", "num_views", "author", "user_reaction"))
+BLOG_AUTHOR_ETAG_COLUMNS = tuple(getattr(models.User, field) for field in schemas.UserResponse.model_fields)
+
+def blog_etag_values(blog) -> tuple:
+    # the same values as get_blog_validator, from a loaded blog
+    return tuple(getattr(blog, c.key) for c in BLOG_ETAG_COLUMNS) + \
+        tuple(getattr(blog.author, c.key) for c in BLOG_AUTHOR_ETAG_COLUMNS)
+
+# Just the fields the blog ETag is made of, for If-None-Match checks without loading content
+def get_blog_validator(db: Session, blog_id: int):
+    try:
+        return db.query(*BLOG_ETAG_COLUMNS, *BLOG_AUTHOR_ETAG_COLUMNS).join(models.Blog.author).filter(
+            models.Blog.blog_id == blog_id
+        ).first()
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Database error")
+
+# Serialized GET /blogs pages by (filters, page), see routers.blogs.read_blogs.
+# events.py drops pages when blogs are inserted, edited or deleted; raw SQL counter updates call
+# invalidate_blog_listing. Views (written in batches) and other workers' writes show after BLOG_LIST_CACHE_TTL_SECONDS.
+blog_list_cache = TTLCache(maxsize=BLOG_LIST_CACHE_SIZE, ttl=BLOG_LIST_CACHE_TTL_SECONDS)
+
+def invalidate_blog_listing(blog_id: Optional[int] = None):
+    # one blog's counters changed -> only the pages showing it, anything else -> every page
+    if blog_id is None:
+        blog_list_cache.clear()
+    else:
+        blog_list_cache.invalidate_where(lambda page: blog_id in page["blog_ids"])
+
+# Columns behind schemas.BlogListResponse / schemas.UserResponse, for load_only() on list endpoints
+BLOG_LIST_COLUMNS = (
+    models.Blog.blog_id, models.Blog.title, models.Blog.rating, models.Blog.likes, models.Blog.dislikes,
+    models.Blog.num_views, models.Blog.updated_at, models.Blog.cover_image, models.Blog.excerpt,
+    models.Blog.estimated_reading_time, models.Blog.slug, models.Blog.author_id,
+)
+USER_RESPONSE_COLUMNS = (
+    models.User.user_id, models.User.email, models.User.user_type, models.User.name, models.User.picture,
+    models.User.created_at,
+)
+
+# Blog listing, newest first. Pages either by offset (page/per_page) or by keyset:
+# after=(updated_at, blog_id) of the last row already seen, which is a single index range scan at any depth.
+def get_blogs(db: Session, visibility: Optional[str] = None, is_hidden: Optional[bool] = None,
+              limit: int = 10, offset: int = 0, after: Optional[tuple[datetime, int]] = None):
+    try:
+        # only what BlogListResponse shows (no content), author joined in the same statement
+        query = db.query(models.Blog).options(
+            load_only(*BLOG_LIST_COLUMNS),
+            joinedload(models.Blog.author).load_only(*USER_RESPONSE_COLUMNS),
+        )
+        if visibility:
+            query = query.filter(models.Blog.visibility == visibility)
+        if is_hidden is not None:
+            query = query.filter(models.Blog.is_hidden == is_hidden)
+
+        # Soft delete filter
+        query = query.filter(models.Blog.deleted_at == None)
+
+        # Order by most recent
+        query = query.order_by(desc(models.Blog.updated_at), desc(models.Blog.blog_id))
+
+        if after is not None:
+            query = query.filter(tuple_(models.Blog.updated_at, models.Blog.blog_id) < tuple_(*after))
+        else:
+            query = query.offset(offset)
+
+        return query.limit(limit).all()
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Database error")
+
 '''
 modify later
 # Update get_blog function in crud.py
@@ -180,6 +286,12 @@ def delete_blog(db: Session, blog_id: int):
 # Comment CRUD
 def create_comment(db: Session, comment: schemas.CommentCreate, blog_id: int, user_id: int):
     try:
+        if comment.parent_comment_id is not None:
+            parent_blog_id = db.query(models.Comment.blog_id).filter(
+                models.Comment.comment_id == comment.parent_comment_id, models.Comment.deleted_at == None
+            ).scalar()
+            if parent_blog_id != blog_id:
+                raise HTTPException(status_code=400, detail="Parent comment not found in this blog")
         db_comment = models.Comment(**comment.dict(), blog_id=blog_id, user_id=user_id)
         db.add(db_comment)
         db.commit()
@@ -195,6 +307,70 @@ def get_comments_by_blog(db: Session, blog_id: int):
     except SQLAlchemyError:
         raise HTTPException(status_code=500, detail="Database error")
 
+# Threaded comments of a blog: one page of top-level comments (oldest first, keyset on (created_at, comment_id))
+# with their replies, all from a single recursive CTE. Each thread is cut to reply_cap replies, shallowest first,
+# so a kept reply's parent is always kept too; reply_count still tells how many there are.
+COMMENT_MAX_DEPTH = 20
+
+def get_comment_threads(db: Session, blog_id: int, limit: int = 20, reply_cap: int = 10,
+                        after: Optional[tuple[datetime, int]] = None) -> list[schemas.CommentThreadResponse]:
+    try:
+        roots = select(models.Comment.comment_id).filter(
+            models.Comment.blog_id == blog_id,
+            models.Comment.parent_comment_id == None,
+            models.Comment.deleted_at == None,
+        )
+        if after is not None:
+            roots = roots.filter(tuple_(models.Comment.created_at, models.Comment.comment_id) > tuple_(*after))
+        roots = roots.order_by(models.Comment.created_at, models.Comment.comment_id).limit(limit).cte("roots")
+
+        tree = (
+            select(models.Comment.comment_id, models.Comment.comment_id.label("root_id"),
+                   models.Comment.created_at, literal(0).label("depth"))
+            .join(roots, roots.c.comment_id == models.Comment.comment_id)
+            .cte("tree", recursive=True)
+        )
+        reply = aliased(models.Comment)
+        tree = tree.union_all(
+            select(reply.comment_id, tree.c.root_id, reply.created_at, tree.c.depth + 1)
+            .where(reply.parent_comment_id == tree.c.comment_id, reply.deleted_at == None, tree.c.depth < COMMENT_MAX_DEPTH)
+        )
+        ranked = select(
+            tree.c.comment_id,
+            func.row_number().over(partition_by=tree.c.root_id,
+                                   order_by=(tree.c.depth, tree.c.created_at, tree.c.comment_id)).label("position"),
+            (func.count().over(partition_by=tree.c.root_id) - 1).label("reply_count"),
+        ).subquery("ranked")
+
+        rows = db.execute(
+            select(models.Comment, ranked.c.reply_count)
+            .join(ranked, ranked.c.comment_id == models.Comment.comment_id)
+            .where(ranked.c.position <= reply_cap + 1) # the top-level comment is position 1
+            .order_by(models.Comment.created_at, models.Comment.comment_id)
+            .options(
+                load_only(models.Comment.comment_id, models.Comment.content, models.Comment.likes, models.Comment.dislikes,
+                          models.Comment.is_hidden, models.Comment.created_at, models.Comment.parent_comment_id,
+                          models.Comment.user_id),
+                selectinload(models.Comment.user).load_only(*USER_RESPONSE_COLUMNS), # all authors in one more query
+            )
+        ).all()
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Database error")
+
+    # rows come oldest first, so every list below is in (created_at, comment_id) order
+    nodes = {}
+    threads = []
+    for comment, reply_count in rows:
+        node = schemas.CommentThreadResponse.model_validate(comment)
+        nodes[comment.comment_id] = node
+        if comment.parent_comment_id is None:
+            node.reply_count = reply_count
+            threads.append(node)
+    for node in nodes.values():
+        if node.parent_comment_id is not None and node.parent_comment_id in nodes:
+            nodes[node.parent_comment_id].replies.append(node)
+    return threads
+
 def delete_comment(db: Session, comment_id: int):
     try:
         db_comment = db.query(models.Comment).filter(models.Comment.comment_id == comment_id).first()
@@ -264,58 +440,81 @@ def get_login_history(db: Session, user_id: int):
     except SQLAlchemyError:
         raise HTTPException(status_code=500, detail="Database error")
 
+# Newest first, read through a server-side cursor for NDJSON exports (see utils.streaming)
+def stream_login_history(db: Session, user_id: int, yield_per: int = 500):
+    query = db.query(models.LoginHistory).filter(models.LoginHistory.user_id == user_id).order_by(
+        models.LoginHistory.login_timestamp.desc()
+    )
+    for login in query.yield_per(yield_per):
+        yield schemas.LoginHistoryResponse.model_validate(login)
+
 # See https://grok.com/chat/4ba28422-595c-4b11-be92-e9633ca631d3    
 # Create or update a reaction for a blog
+# One statement, one round trip: the same reaction again removes it, the other one switches it, none yet adds it.
+# The blog counters are adjusted in the database from what actually changed, so parallel toggles can't lose updates.
+# uq_blog_reactions_blog_id_user_id makes a second row for (blog_id, user_id) impossible.
+REACTION_TYPE = models.BlogReaction.reaction_type.type
+REACTION_TOGGLE_SQL = text(f"""
+WITH existing AS (
+    SELECT reaction_type FROM blog_reactions WHERE blog_id = :blog_id AND user_id = :user_id
+),
+removed AS (
+    DELETE FROM blog_reactions
+    WHERE blog_id = :blog_id AND user_id = :user_id AND reaction_type = CAST(:reaction_type AS {REACTION_TYPE.name})
+    RETURNING reaction_id, blog_id, user_id, reaction_type, 'removed' AS change
+),
+upserted AS (
+    INSERT INTO blog_reactions (blog_id, user_id, reaction_type)
+    SELECT CAST(:blog_id AS INTEGER), CAST(:user_id AS INTEGER), CAST(:reaction_type AS {REACTION_TYPE.name})
+    WHERE NOT EXISTS (SELECT 1 FROM existing WHERE reaction_type = CAST(:reaction_type AS {REACTION_TYPE.name}))
+    ON CONFLICT (blog_id, user_id) DO UPDATE SET reaction_type = EXCLUDED.reaction_type
+        WHERE blog_reactions.reaction_type <> EXCLUDED.reaction_type
+    RETURNING reaction_id, blog_id, user_id, reaction_type,
+        CASE WHEN blog_reactions.xmax = 0 THEN 'added' ELSE 'switched' END AS change
+),
+changes AS (
+    SELECT * FROM removed UNION ALL SELECT * FROM upserted
+),
+counted AS (
+    UPDATE blogs SET
+        likes = coalesce(likes, 0) + (
+            SELECT coalesce(sum(CASE
+                WHEN reaction_type = CAST(:like AS {REACTION_TYPE.name}) THEN CASE WHEN change = 'removed' THEN -1 ELSE 1 END
+                WHEN change = 'switched' THEN -1 ELSE 0 END), 0) FROM changes),
+        dislikes = coalesce(dislikes, 0) + (
+            SELECT coalesce(sum(CASE
+                WHEN reaction_type = CAST(:dislike AS {REACTION_TYPE.name}) THEN CASE WHEN change = 'removed' THEN -1 ELSE 1 END
+                WHEN change = 'switched' THEN -1 ELSE 0 END), 0) FROM changes)
+    WHERE blog_id = :blog_id AND EXISTS (SELECT 1 FROM changes)
+)
+SELECT reaction_id, blog_id, user_id, reaction_type FROM changes
+""").bindparams(
+    bindparam("reaction_type", type_=REACTION_TYPE),
+    bindparam("like", models.ReactionType.LIKE, type_=REACTION_TYPE),
+    bindparam("dislike", models.ReactionType.DISLIKE, type_=REACTION_TYPE),
+).columns(
+    column("reaction_id", Integer), column("blog_id", Integer), column("user_id", Integer), column("reaction_type", REACTION_TYPE)
+)
+
 def create_or_update_reaction(db: Session, blog_id: int, user_id: int, reaction: schemas.BlogReactionCreate):
     try:
-        # Check if the user already has a reaction
-        existing_reaction = db.query(models.BlogReaction).filter(
-            models.BlogReaction.blog_id == blog_id,
-            models.BlogReaction.user_id == user_id
-        ).first()
-
-        # Get the blog
-        blog = db.query(models.Blog).filter(models.Blog.blog_id == blog_id).first()
-        if not blog:
-            raise HTTPException(status_code=404, detail="Blog not found")
-
-        if existing_reaction:
-            # If the same reaction, remove it (cancel)
-            if existing_reaction.reaction_type == reaction.reaction_type: # type: ignore
-                db.delete(existing_reaction)
-                if reaction.reaction_type == "like":
-                    blog.likes -= 1 # type: ignore
-                else:
-                    blog.dislikes -= 1 # type: ignore
-            # If different reaction, update it
-            else:
-                if existing_reaction.reaction_type == "like": # type: ignore
-                    blog.likes -= 1 # type: ignore
-                    blog.dislikes += 1 # type: ignore
-                else:
-                    blog.dislikes -= 1 # type: ignore
-                    blog.likes += 1 # type: ignore
-                existing_reaction.reaction_type = reaction.reaction_type # type: ignore
-        else:
-            # Create new reaction
-            db_reaction = models.BlogReaction(
-                blog_id=blog_id,
-                user_id=user_id,
-                reaction_type=reaction.reaction_type
-            )
-            db.add(db_reaction)
-            if reaction.reaction_type == "like":
-                blog.likes += 1 # type: ignore
-            else:
-                blog.dislikes += 1 # type: ignore
-
+        changed = db.execute(REACTION_TOGGLE_SQL, {
+            "blog_id": blog_id,
+            "user_id": user_id,
+            "reaction_type": models.ReactionType(reaction.reaction_type),
+        }).first()
         db.commit()
-        db.refresh(blog)
-        return existing_reaction or db_reaction
+        invalidate_blog_listing(blog_id) # counters changed by raw SQL, no mapper events
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Blog not found")
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to process reaction: {e}")
 
+    # nothing changed only if a parallel request already left this exact state, report what is stored
+    return changed or get_user_reaction(db, blog_id, user_id)
+
 # Get a user's reaction for a blog
 def get_user_reaction(db: Session, blog_id: int, user_id: int):
     try:
@@ -326,3 +525,97 @@ def get_user_reaction(db: Session, blog_id: int, user_id: int):
         return reaction
     except SQLAlchemyError:
         raise HTTPException(status_code=500, detail="Database error")
+
+# Full text search for /search, ranked by ts_rank_cd over the GIN indexed search_vector columns
+SEARCH_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2"
+
+def to_prefix_tsquery(text_query: str) -> Optional[str]:
+    # "eye dro" -> "eye & dro:*" so results show up while the last word is still being typed
+    terms = re.findall(r"[^\W_]+", text_query)
+    if not terms:
+        return None
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+def search_fulltext(db: Session, text_query: str, include_author: bool = False, limit: int = 20,
+                    after: Optional[tuple[float, str, int]] = None):
+    # Blog and comment hits merged by score, then paged by keyset on (score, type, key), key being
+    # blog_id or comment_id. Snippets (ts_headline) are only built for the rows of the page.
+    tsquery = to_prefix_tsquery(text_query)
+    if tsquery is None:
+        return []
+
+    try:
+        query = func.to_tsquery("english", tsquery)
+        blog_vector = models.Blog.__table__.c.search_vector
+        comment_vector = models.Comment.__table__.c.search_vector
+        name_query = func.to_tsquery("simple", tsquery) # names aren't stemmed
+        name_vector = func.to_tsvector("simple", func.coalesce(models.User.name, ""))
+
+        # float8, so the score in a cursor compares exactly with the next query
+        def score(vector, q):
+            return cast(func.ts_rank_cd(vector, q), Float).label("score")
+
+        hits = [
+            select(literal("blog").label("type"), models.Blog.blog_id.label("key"), score(blog_vector, query))
+            .where(blog_vector.bool_op("@@")(query), models.Blog.deleted_at == None),
+            select(literal("comment").label("type"), models.Comment.comment_id.label("key"), score(comment_vector, query))
+            .where(comment_vector.bool_op("@@")(query), models.Comment.deleted_at == None),
+        ]
+        if include_author:
+            hits += [
+                select(literal("blog").label("type"), models.Blog.blog_id.label("key"), score(name_vector, name_query))
+                .join(models.User, models.Blog.author_id == models.User.user_id)
+                .where(name_vector.bool_op("@@")(name_query), models.Blog.deleted_at == None),
+                select(literal("comment").label("type"), models.Comment.comment_id.label("key"), score(name_vector, name_query))
+                .join(models.User, models.Comment.user_id == models.User.user_id)
+                .where(name_vector.bool_op("@@")(name_query), models.Comment.deleted_at == None),
+            ]
+
+        merged = union_all(*hits).subquery("hits")
+        ranked = (
+            select(merged.c.type, merged.c.key, func.max(merged.c.score).label("score"))
+            .group_by(merged.c.type, merged.c.key)
+            .subquery("ranked")
+        )
+        page = select(ranked.c.score, ranked.c.type, ranked.c.key)
+        if after is not None:
+            page = page.where(tuple_(ranked.c.score, ranked.c.type, ranked.c.key) < tuple_(*after))
+        page = page.order_by(desc(ranked.c.score), desc(ranked.c.type), desc(ranked.c.key)).limit(limit)
+        page_hits = db.execute(page).all()
+
+        blog_ids = [hit.key for hit in page_hits if hit.type == "blog"]
+        comment_ids = [hit.key for hit in page_hits if hit.type == "comment"]
+        details = {}
+        if blog_ids:
+            rows = db.execute(
+                select(models.Blog.blog_id, models.Blog.title, models.Blog.excerpt, models.Blog.likes,
+                       models.Blog.dislikes, models.Blog.updated_at, models.User.name.label("author_name"),
+                       func.ts_headline("english", models.Blog.content, query, SEARCH_HEADLINE_OPTIONS).label("snippet"))
+                .outerjoin(models.User, models.Blog.author_id == models.User.user_id)
+                .where(models.Blog.blog_id.in_(blog_ids))
+            )
+            for row in rows:
+                details[("blog", row.blog_id)] = {
+                    "id": row.blog_id, "title": row.title, "content": row.excerpt, "author_name": row.author_name,
+                    "likes": row.likes, "dislikes": row.dislikes, "date": row.updated_at, "snippet": row.snippet,
+                }
+        if comment_ids:
+            rows = db.execute(
+                select(models.Comment.comment_id, models.Comment.blog_id, models.Comment.content, models.Comment.likes,
+                       models.Comment.dislikes, models.Comment.created_at, models.User.name.label("author_name"),
+                       func.ts_headline("english", models.Comment.content, query, SEARCH_HEADLINE_OPTIONS).label("snippet"))
+                .outerjoin(models.User, models.Comment.user_id == models.User.user_id)
+                .where(models.Comment.comment_id.in_(comment_ids))
+            )
+            for row in rows:
+                details[("comment", row.comment_id)] = {
+                    "id": row.blog_id, "title": None, "content": row.content, "author_name": row.author_name,
+                    "likes": row.likes, "dislikes": row.dislikes, "date": row.created_at, "snippet": row.snippet,
+                }
+
+        return [
+            {"type": hit.type, "key": hit.key, "score": hit.score, **details[(hit.type, hit.key)]}
+            for hit in page_hits if (hit.type, hit.key) in details
+        ]
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Database error")
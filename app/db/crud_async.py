@@ -0,0 +1,165 @@
+# Async CRUD functions for the async def endpoints (see database.get_async_db): Google login, /refresh, /logout
+# Everything else is in app.db.crud, the plain def routers run it in FastAPI's threadpool. Only what an async
+# endpoint awaits belongs here, not a second copy of crud.
+
+import logging
+from fastapi import HTTPException
+from datetime import timedelta
+from sqlalchemy import Integer, Interval, String, bindparam, func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from app.db import models
+from app.db.crud import user_cache
+from app.db.session_revocations import session_revocations
+from app.utils import constants, utils
+
+logger = logging.getLogger(__name__)
+
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    try:
+        result = await db.execute(select(models.User).filter(models.User.user_id == user_id))
+        return result.scalars().first()
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="Database error")
+
+# Google login in one statement: finds the user by google_id, or inserts it (a concurrent first login of the same
+# email turns into an update through ON CONFLICT), and from the RETURNING writes the login_history row and the
+# user_sessions row of this device. The refresh token is random, not derived from the user, so its hash is a parameter.
+LOGIN_USER_COLUMNS = "user_id, email, user_type, auth_method, is_banned, name, picture"
+LOGIN_GOOGLE_USER_SQL = text(f"""
+WITH by_google_id AS (
+    UPDATE users SET last_login = now()
+    WHERE google_id = :google_id
+    RETURNING {LOGIN_USER_COLUMNS}
+),
+upserted AS (
+    INSERT INTO users (email, user_type, auth_method, google_id, name, picture, is_banned, verification_status, created_at, last_login)
+    SELECT :email, 'general', 'google', :google_id, :name, :picture, false, 'pending', now(), now()
+    WHERE NOT EXISTS (SELECT 1 FROM by_google_id)
+    ON CONFLICT (email) DO UPDATE SET last_login = now(), google_id = coalesce(users.google_id, EXCLUDED.google_id)
+    RETURNING {LOGIN_USER_COLUMNS}
+),
+logged_in AS (
+    SELECT * FROM by_google_id UNION ALL SELECT * FROM upserted
+),
+history AS (
+    INSERT INTO login_history (user_id, login_timestamp, ip_address, user_agent, is_success, device_id, location, os, browser, two_factor_auth_used)
+    SELECT user_id, now(), :ip_address, :user_agent, true, :device_id, :location, :os, :browser, false FROM logged_in
+),
+new_session AS (
+    INSERT INTO user_sessions (user_id, token_hash, created_at, last_used_at, expires_at, ip_address, user_agent, device_id)
+    SELECT user_id, :token_hash, now(), now(), now() + :lifetime, :ip_address, :user_agent, :device_id FROM logged_in
+    RETURNING session_id
+)
+SELECT {LOGIN_USER_COLUMNS}, session_id FROM logged_in CROSS JOIN new_session
+""").bindparams(*(bindparam(name, type_=String) for name in (
+    # typed, so asyncpg gets casts and one type per parameter used in several places
+    "google_id", "email", "name", "picture", "ip_address", "user_agent", "device_id", "location", "os", "browser",
+    "token_hash")), bindparam("lifetime", type_=Interval))
+
+def session_lifetime() -> timedelta:
+    return timedelta(days=constants.REFRESH_TOKEN_EXPIRE_DAYS)
+
+async def login_google_user(db: AsyncSession, user_info: dict, client_info: dict):
+    # -> (user row: user_id, email, user_type, auth_method, is_banned, name, picture, session_id; refresh token)
+    refresh_token, token_hash = utils.new_refresh_token()
+    try:
+        user = (await db.execute(LOGIN_GOOGLE_USER_SQL, {
+            "google_id": user_info.get("sub"),
+            "email": user_info.get("email"),
+            "name": user_info.get("name"),
+            "picture": user_info.get("picture"),
+            "ip_address": client_info.get("client_ip"),
+            "user_agent": client_info.get("user_agent"),
+            "device_id": client_info.get("device"),
+            "location": client_info.get("location"),
+            "os": client_info.get("os"),
+            "browser": client_info.get("browser"),
+            "token_hash": token_hash,
+            "lifetime": session_lifetime(),
+        })).one()
+        await db.commit()
+        user_cache.invalidate(user.user_id)
+        return user, refresh_token
+    except SQLAlchemyError:
+        # raised as is: google_callback logs it and records the failed login as database_error
+        await db.rollback()
+        raise
+
+# /refresh: one UPDATE through the unique index on token_hash swaps in the hash of the next token and returns
+# the claims for the access token. Only when it matches nothing, a second lookup tells why (see rotate_refresh_token).
+SESSION_USER_COLUMNS = ", ".join(f"users.{column}" for column in LOGIN_USER_COLUMNS.split(", "))
+ROTATE_REFRESH_TOKEN_SQL = text(f"""
+UPDATE user_sessions SET previous_token_hash = token_hash, token_hash = :new_hash, rotated_at = now(), last_used_at = now()
+FROM users
+WHERE user_sessions.token_hash = :token_hash AND user_sessions.revoked_at IS NULL
+  AND user_sessions.expires_at > localtimestamp
+  AND users.user_id = user_sessions.user_id AND users.deleted_at IS NULL
+RETURNING user_sessions.session_id, {SESSION_USER_COLUMNS}
+""").bindparams(bindparam("token_hash", type_=String), bindparam("new_hash", type_=String))
+
+FIND_SESSION_BY_ANY_TOKEN = select(
+    models.UserSession.session_id, models.UserSession.revoked_at,
+    (models.UserSession.token_hash == bindparam("token_hash")).label("is_current"),
+    (models.UserSession.rotated_at > func.localtimestamp() - bindparam("grace", type_=Interval)).label("in_grace"),
+).where(or_(models.UserSession.token_hash == bindparam("token_hash"),
+            models.UserSession.previous_token_hash == bindparam("token_hash")))
+
+# (bindparams not named like a column, those names are taken by the SET clause)
+def revoke_sessions_statement(*where):
+    return update(models.UserSession).where(models.UserSession.revoked_at.is_(None), *where).values(
+        revoked_at=func.now(), revoke_reason=bindparam("reason", type_=String)).returning(
+        models.UserSession.session_id, models.UserSession.revoked_at).execution_options(synchronize_session=False)
+
+REVOKE_SESSION_BY_ID = revoke_sessions_statement(models.UserSession.session_id == bindparam("id", type_=Integer))
+REVOKE_SESSION_BY_TOKEN = revoke_sessions_statement(models.UserSession.token_hash == bindparam("hash", type_=String))
+REVOKE_USER_SESSIONS_BY_TOKEN = revoke_sessions_statement(models.UserSession.user_id == select(
+    models.UserSession.user_id).where(models.UserSession.token_hash == bindparam("hash", type_=String)).scalar_subquery())
+
+async def revoke_sessions(db: AsyncSession, statement, params: dict) -> int:
+    # commits, this worker stops accepting the sessions' access tokens now, the others at their next poll
+    revoked = (await db.execute(statement, params)).all()
+    await db.commit()
+    for session_id, revoked_at in revoked:
+        session_revocations.add(session_id, revoked_at)
+    return len(revoked)
+
+async def rotate_refresh_token(db: AsyncSession, refresh_token: str):
+    # -> (user row: session_id, user_id, email, user_type, auth_method, is_banned, name, picture; next refresh token)
+    # the token sent is used up: a second use after the reuse grace means it was copied, the session is revoked
+    token_hash = utils.hash_refresh_token(refresh_token)
+    new_token, new_hash = utils.new_refresh_token()
+    try:
+        user = (await db.execute(ROTATE_REFRESH_TOKEN_SQL, {"token_hash": token_hash, "new_hash": new_hash})).first()
+        if user is not None:
+            await db.commit()
+            return user, new_token
+
+        session = (await db.execute(FIND_SESSION_BY_ANY_TOKEN, {
+            "token_hash": token_hash, "grace": timedelta(seconds=constants.REFRESH_REUSE_GRACE_SECONDS)})).first()
+        await db.rollback()
+        if session is None:
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        if session.is_current or session.revoked_at is not None:
+            raise HTTPException(status_code=401, detail="Session has expired or was revoked")
+        if session.in_grace:
+            # two refreshes of one client crossing each other (e.g. two tabs), the other one got the next token
+            raise HTTPException(status_code=401, detail="Refresh token was already used")
+        await revoke_sessions(db, REVOKE_SESSION_BY_ID, {"id": session.session_id, "reason": "reuse"})
+        raise HTTPException(status_code=401, detail="Refresh token reuse detected, the session was revoked")
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Database error during token refresh: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+async def logout(db: AsyncSession, refresh_token: str, all_devices: bool = False) -> int:
+    # -> number of sessions revoked (0 for an unknown or already revoked token, logging out twice is fine)
+    statement = REVOKE_USER_SESSIONS_BY_TOKEN if all_devices else REVOKE_SESSION_BY_TOKEN
+    try:
+        return await revoke_sessions(db, statement, {
+            "hash": utils.hash_refresh_token(refresh_token), "reason": "logout_all" if all_devices else "logout"})
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Database error during logout: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
@@ -4,6 +4,7 @@
 from app.db.models import Blog
 from sqlalchemy import event, func  # Import func here
 from sqlalchemy.orm import Session, object_session  # Use object_session instead of Session
+from app.db.crud import invalidate_blog_listing
 
 @event.listens_for(Blog, 'before_update')
 def update_updated_at_before_update(mapper, connection, target):
@@ -21,3 +22,43 @@ def update_updated_at_before_update(mapper, connection, target):
         # Check if any trigger fields have changed
         if any(insp.attrs[field].history.has_changes() for field in trigger_fields):
             target.updated_at = func.now()  # Use func.now() for timestamp
+
+
+# Blog listing cache invalidation (crud.blog_list_cache)
+# Mapper events only note what changed; the cache is dropped after the commit, so nothing is dropped for a
+# rollback. A request that read the old rows before the commit doesn't store its page afterwards: the drop
+# bumps blog_list_cache.generation, which read_blogs took before its query (see TTLCache.set).
+LISTING_COUNTER_FIELDS = {'likes', 'dislikes', 'num_views', 'rating'}
+
+def pending_listing_invalidations(target) -> set:
+    session = object_session(target)
+    return session.info.setdefault('blog_listing_invalidations', set()) if session else set()
+
+@event.listens_for(Blog, 'after_insert')
+@event.listens_for(Blog, 'after_delete')
+def invalidate_listing_after_insert_or_delete(mapper, connection, target):
+    pending_listing_invalidations(target).add(None) # every page shifts
+
+@event.listens_for(Blog, 'after_update')
+def invalidate_listing_after_update(mapper, connection, target):
+    from sqlalchemy import inspect
+    changed = {attr.key for attr in inspect(target).attrs if attr.history.has_changes()}
+    if not changed:
+        return
+    # counters only change what the pages showing this blog say, anything else (order, filters) may move it
+    pending_listing_invalidations(target).add(target.blog_id if changed <= LISTING_COUNTER_FIELDS else None)
+
+@event.listens_for(Session, 'after_commit')
+def apply_listing_invalidations(session):
+    invalidations = session.info.pop('blog_listing_invalidations', None)
+    if not invalidations:
+        return
+    if None in invalidations:
+        invalidate_blog_listing()
+    else:
+        for blog_id in invalidations:
+            invalidate_blog_listing(blog_id)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_listing_invalidations(session):
+    session.info.pop('blog_listing_invalidations', None)
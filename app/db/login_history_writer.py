@@ -0,0 +1,140 @@
+# Write-behind login_history for failed OAuth callbacks
+# (a successful login writes its row in its own transaction, see crud_async.login_google_user)
+# A failed login only puts its audit row on a bounded in-process queue, a background task drains it and
+# inserts whole batches in one executemany on the async engine, so an error path never waits on (or fails
+# because of) the audit write, and a storm of failures turns into a few multi-row INSERTs.
+# When the queue is full the row is dropped and counted (login wins over audit), see stats().
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import TIMESTAMP, bindparam, cast, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import models
+from app.db.database import async_engine
+
+logger = logging.getLogger(__name__)
+
+LOGIN_HISTORY_QUEUE_SIZE = int(os.getenv("LOGIN_HISTORY_QUEUE_SIZE", "10000"))
+LOGIN_HISTORY_BATCH_SIZE = int(os.getenv("LOGIN_HISTORY_BATCH_SIZE", "500"))
+LOGIN_HISTORY_MAX_DELAY_SECONDS = float(os.getenv("LOGIN_HISTORY_MAX_DELAY_SECONDS", "1")) # longest a row waits for its batch to fill
+
+# login_timestamp is the time of the login, not of the batch: passed as timestamptz and converted
+# by the server the same way its now() default would be
+INSERT_LOGIN_HISTORY = insert(models.LoginHistory).values(
+    login_timestamp=cast(bindparam("logged_in_at"), TIMESTAMP(timezone=True))
+)
+
+
+class LoginHistoryWriter:
+    def __init__(self, maxsize: int = LOGIN_HISTORY_QUEUE_SIZE, batch_size: int = LOGIN_HISTORY_BATCH_SIZE,
+                 max_delay: float = LOGIN_HISTORY_MAX_DELAY_SECONDS):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue = None
+        self.task = None
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.failed_rows = 0
+        self.depth_peak = 0
+
+    def record(self, client_info: dict, is_success: bool = True, failure_reason=None) -> bool:
+        # never blocks, False when the row had to be dropped
+        row = {
+            "user_id": client_info.get("user_id"),
+            "ip_address": client_info.get("client_ip"),
+            "user_agent": client_info.get("user_agent"),
+            "is_success": is_success,
+            "failure_reason": failure_reason,
+            "device_id": client_info.get("device"),
+            "location": client_info.get("location"),
+            "os": client_info.get("os"),
+            "browser": client_info.get("browser"),
+            "logged_in_at": datetime.now(timezone.utc),
+        }
+        if self.queue is None:
+            logger.error("login_history writer is not running, dropping a login record")
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"login_history queue full ({self.maxsize}), dropping a login record")
+            return False
+        self.queued += 1
+        self.depth_peak = max(self.depth_peak, self.queue.qsize())
+        return True
+
+    async def write(self, batch: list):
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(INSERT_LOGIN_HISTORY, batch)
+        except (SQLAlchemyError, OSError) as e: # the writer task has to outlive a lost connection
+            self.failed_batches += 1
+            self.failed_rows += len(batch)
+            logger.error(f"Failed to insert {len(batch)} login_history records: {e}")
+            return
+        self.written += len(batch)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self.queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.batch_size:
+                try:
+                    row = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self.write(batch)
+
+    def start(self):
+        if self.task is None:
+            self.queue = asyncio.Queue(maxsize=self.maxsize)
+            self.task = asyncio.create_task(self.run(), name="login-history-writer")
+
+    async def stop(self):
+        # on shutdown: everything queued before the marker is written, then the task ends
+        # (put waits for room if the queue is full, the writer keeps draining)
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+        self.queue = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_depth_peak": self.depth_peak,
+            "queue_size": self.maxsize,
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+            "failed_rows": self.failed_rows,
+        }
+
+
+login_history_writer = LoginHistoryWriter()
@@ -1,5 +1,6 @@
 # app/db/models.py
-from sqlalchemy import JSON, Column, Integer, String, Float, Boolean, TIMESTAMP, Text, ForeignKey, Enum
+from sqlalchemy import JSON, DDL, Column, Integer, String, Float, Boolean, TIMESTAMP, Text, ForeignKey, Enum, Index, UniqueConstraint, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -20,7 +21,7 @@ class User(Base):
     google_id = Column(String(100), unique=True, nullable=True)  # from google user info
     name = Column(String(100)) # google name first + last name
     picture = Column(String) # google picture link
-    refresh_token = Column(String, nullable=True)
+    refresh_token = Column(String, nullable=True) # unused since user_sessions, cleared by migration 622ab3276f9a
     created_at = Column(TIMESTAMP, server_default=func.now())
     phone_number = Column(String(20), nullable=True) # from profile clinic
     address = Column(Text, nullable=True) # from profile clinic
@@ -71,6 +72,19 @@ class Blog(Base):
     original_source = Column(String, nullable=True)
     language = Column(String, nullable=True)
     deleted_at = Column(TIMESTAMP, nullable=True)  # Soft delete
+    # Full text search for /search, kept current by a trigger (see search_vector_trigger below), title ranks above
+    # excerpt above content. Table column only (see __mapper_args__), so the ORM never selects it or fetches it back
+    search_vector = Column(TSVECTOR, nullable=True)
+
+    # GET /blogs listing: live blogs newest first, with or without the visibility/is_hidden filters
+    # (kept in sync with the alembic migrations)
+    __table_args__ = (
+        Index("ix_blogs_listing", updated_at.desc(), blog_id.desc(), postgresql_where=deleted_at.is_(None)),
+        Index("ix_blogs_visibility_listing", visibility, is_hidden, updated_at.desc(), blog_id.desc(),
+              postgresql_where=deleted_at.is_(None)),
+        Index("ix_blogs_search_vector", "search_vector", postgresql_using="gin"),
+    )
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
 
     author = relationship("User", back_populates="blogs")
     comments = relationship("Comment", back_populates="blog")
@@ -86,13 +100,24 @@ class Comment(Base):
     is_hidden = Column(Boolean, default=False)
     why_is_hidden = Column(Text, default=None)
     created_at = Column(TIMESTAMP, server_default=func.now())
-    parent_comment_id = Column(Integer, nullable=True)
+    parent_comment_id = Column(Integer, ForeignKey("comments.comment_id", ondelete="CASCADE"), nullable=True) # NULL for a top-level comment
     rating = Column(Float, nullable=True)
     edited_at = Column(TIMESTAMP, nullable=True)
     likes = Column(Integer, default=0)
     dislikes = Column(Integer, default=0)
     report_count = Column(Integer, default=0)
     deleted_at = Column(TIMESTAMP, nullable=True)  # Soft delete
+    search_vector = Column(TSVECTOR, nullable=True) # trigger, see search_vector_trigger below
+
+    __table_args__ = (
+        Index("ix_comments_blog_id_created_at", blog_id, created_at),
+        # top-level comments of a blog in thread order, and the replies of each comment (see crud.get_comment_threads)
+        Index("ix_comments_blog_threads", blog_id, created_at, comment_id,
+              postgresql_where=parent_comment_id.is_(None) & deleted_at.is_(None)),
+        Index("ix_comments_parent_comment_id", parent_comment_id),
+        Index("ix_comments_search_vector", "search_vector", postgresql_using="gin"),
+    )
+    __mapper_args__ = {"exclude_properties": ["search_vector"]}
 
     blog = relationship("Blog", back_populates="comments")
     user = relationship("User", back_populates="comments")
@@ -130,8 +155,69 @@ class LoginHistory(Base):
     os = Column(String, nullable=True)
     browser = Column(String, nullable=True)
 
+    __table_args__ = (
+        Index("ix_login_history_user_id_login_timestamp", user_id, login_timestamp.desc()),
+    )
+
     user = relationship("User", back_populates="login_history")
 
+# search_vector of blogs and comments: filled by a BEFORE INSERT/UPDATE trigger when the text changes
+# (a trigger and not a STORED generated column, which can only be added by rewriting the whole table, see
+# alembic 1d9c057dd5c5). The migration creates them, create_all does the same here for new databases.
+BLOG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(NEW.excerpt, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(NEW.content, '')), 'C')"
+)
+COMMENT_SEARCH_VECTOR = "to_tsvector('english', coalesce(NEW.content, ''))"
+
+def search_vector_trigger(table, expression: str, columns: str):
+    name = f"{table.name}_search_vector_update"
+    event.listen(table, "after_create", DDL(f"""
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {expression};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER {name} BEFORE INSERT OR UPDATE OF {columns} ON {table.name}
+FOR EACH ROW EXECUTE FUNCTION {name}();
+""").execute_if(dialect="postgresql"))
+
+search_vector_trigger(Blog.__table__, BLOG_SEARCH_VECTOR, "title, excerpt, content")
+search_vector_trigger(Comment.__table__, COMMENT_SEARCH_VECTOR, "content")
+
+# One row per signed-in device (see crud_async.login_google_user / rotate_refresh_token)
+# Only the SHA-256 of the refresh token is stored. Every /refresh replaces it with the hash of a new token and
+# keeps the old one in previous_token_hash: a token used again after it was rotated revokes the session.
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+
+    session_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    token_hash = Column(String(64), nullable=False)
+    previous_token_hash = Column(String(64), nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    last_used_at = Column(TIMESTAMP, server_default=func.now())
+    rotated_at = Column(TIMESTAMP, nullable=True) # when previous_token_hash was replaced
+    expires_at = Column(TIMESTAMP, nullable=False) # login + REFRESH_TOKEN_EXPIRE_DAYS, rotation doesn't extend it
+    revoked_at = Column(TIMESTAMP, nullable=True)
+    revoke_reason = Column(String(20), nullable=True) # logout, logout_all, reuse
+    ip_address = Column(String(45), nullable=True)
+    user_agent = Column(Text, nullable=True)
+    device_id = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_user_sessions_token_hash", token_hash, unique=True),
+        Index("ix_user_sessions_previous_token_hash", previous_token_hash,
+              postgresql_where=previous_token_hash.isnot(None)),
+        Index("ix_user_sessions_user_id", user_id),
+        # the revocation poller (app/db/session_revocations.py) reads the newest revocations only
+        Index("ix_user_sessions_revoked_at", revoked_at, postgresql_where=revoked_at.isnot(None)),
+    )
+
+    user = relationship("User")
+
 # Seee https://grok.com/chat/4ba28422-595c-4b11-be92-e9633ca631d3
 class ReactionType(str, enum.Enum):
     LIKE = "like"
@@ -145,5 +231,10 @@ class BlogReaction(Base):
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     reaction_type = Column(Enum(ReactionType), nullable=False) 
 
+    # one reaction per user and blog, also the conflict target of crud.create_or_update_reaction
+    __table_args__ = (
+        UniqueConstraint(blog_id, user_id, name="uq_blog_reactions_blog_id_user_id"),
+    )
+
     blog = relationship("Blog", back_populates="reactions")
     user = relationship("User")
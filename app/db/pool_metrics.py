@@ -0,0 +1,136 @@
+# Connection pool instrumentation for app.db.database
+# Tells pool starvation (long checkout waits, overflow in use, timeouts) apart from slow queries.
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# checkouts waiting longer than this are logged as pool starvation
+SLOW_CHECKOUT_MS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_MS", "100"))
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.slow_checkouts = 0
+        self.overflow_peak = 0
+        self.pool = None
+
+    def record_wait(self, seconds: float):
+        slow = seconds * 1000 >= SLOW_CHECKOUT_MS
+        with self.lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if slow:
+                self.slow_checkouts += 1
+        if slow:
+            logger.warning(f"[{self.name}] waited {seconds * 1000:.1f} ms for a pooled connection ({self.pool.status() if self.pool else ''})")
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+        logger.error(f"[{self.name}] timed out waiting for a pooled connection ({self.pool.status() if self.pool else ''})")
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self.lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "slow_checkouts": self.slow_checkouts,
+                "overflow_peak": self.overflow_peak,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    # There is no pool event for the time spent waiting on a checkout, so it is timed around
+    # QueuePool._do_get, which is where the wait for a free (or overflow) connection happens.
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool, keep reporting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        self.metrics.pool = pool
+        return pool
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool, InstrumentedQueuePool):
+    pass
+
+
+def instrument(engine, metrics: PoolMetrics):
+    pool = engine.pool
+    pool.metrics = metrics
+    metrics.pool = pool
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with metrics.lock:
+            metrics.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        current = metrics.pool
+        with metrics.lock:
+            metrics.checkouts += 1
+            if isinstance(current, QueuePool):
+                metrics.overflow_peak = max(metrics.overflow_peak, current.overflow())
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with metrics.lock:
+            metrics.checkins += 1
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with metrics.lock:
+            metrics.invalidations += 1
+        logger.warning(f"[{metrics.name}] connection invalidated: {exception}")
+
+    @event.listens_for(pool, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        with metrics.lock:
+            metrics.soft_invalidations += 1
+
+    return metrics
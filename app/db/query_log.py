@@ -0,0 +1,116 @@
+# SQL statement instrumentation for both engines (app.main calls instrument_engine on each)
+# - every statement is timed; slower than SLOW_QUERY_MS is logged with its normalized SQL (never the parameters)
+# - inside a request (see start_request, called by app.utils.metrics.MetricsMiddleware) statements are counted
+#   per request, with their time and their normalized shape
+# - finish_request: the same shape NPLUSONE_THRESHOLD or more times in one request is logged as a probable N+1
+#   (e.g. a lazy load of Blog.author per row), naming the route
+# Works the same for sync routes (threadpool) and async sessions: both run in a copy of the request's context.
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+NPLUSONE_THRESHOLD = int(os.getenv("NPLUSONE_THRESHOLD", "5")) # same statement shape this many times in one request
+LOGGED_SQL_LENGTH = 1000 # normalized SQL is cut here in the logs
+
+
+class RequestStats:
+    __slots__ = ("scope", "method", "db_seconds", "db_statements", "shapes")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.db_seconds = 0.0
+        self.db_statements = 0
+        self.shapes: Counter = Counter()
+
+    def route_name(self) -> str:
+        # the route template (/blogs/{blog_id}) once routing is done, so ids don't make every path different
+        return getattr(self.scope.get("route"), "path", None) or self.scope["path"]
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+lock = threading.Lock()
+totals = {"slow_statements": 0, "nplusone_requests": 0, "statement_errors": 0}
+
+def count(name: str):
+    with lock:
+        totals[name] += 1
+
+def stats() -> dict:
+    with lock:
+        return dict(totals)
+
+
+LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"), # 'strings'
+    (re.compile(r"%\(\w+\)s|\$\d+|(?<!:):\w+|%s"), "?"), # bind parameters of psycopg2/asyncpg/sqlite/named styles
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b"), "?"), # numbers
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"), # IN lists and VALUES rows of any length
+    (re.compile(r"(?:\(\?, \.\.\.\)\s*,\s*)+\(\?, \.\.\.\)"), "(?, ...), ..."), # multi-row VALUES
+    (re.compile(r"\s+"), " "),
+]
+
+@lru_cache(maxsize=2048)
+def normalize(statement: str) -> str:
+    # same shape for the same query with different values, statements repeat so this is mostly cache hits
+    for pattern, replacement in LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def start_request(scope) -> tuple:
+    stats = RequestStats(scope)
+    return stats, current_request.set(stats)
+
+def finish_request(stats: RequestStats, token):
+    current_request.reset(token)
+    repeated = [(n, shape) for shape, n in stats.shapes.items() if n >= NPLUSONE_THRESHOLD]
+    if not repeated:
+        return
+    count("nplusone_requests")
+    for n, shape in sorted(repeated, reverse=True):
+        logger.warning(f"probable N+1 in {stats.method} {stats.route_name()}: {n} x {shape[:LOGGED_SQL_LENGTH]}")
+
+
+def instrument_engine(engine):
+    # sync Engine, or AsyncEngine.sync_engine
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        request = current_request.get()
+        if request is not None:
+            request.db_seconds += elapsed
+            request.db_statements += 1
+            request.shapes[normalize(statement)] += 1
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            count("slow_statements")
+            where = f" in {request.method} {request.route_name()}" if request is not None else ""
+            logger.warning(f"slow query {elapsed * 1000:.1f} ms{where}: {normalize(statement)[:LOGGED_SQL_LENGTH]}")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # failed statements don't get after_cursor_execute, don't leave their start time behind
+        conn = exception_context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts and exception_context.statement is not None:
+            starts.pop()
+            count("statement_errors")
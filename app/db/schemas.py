@@ -23,12 +23,22 @@ class UserResponse(BaseModel):
     user_type: str
     name: Optional[str]
     picture: Optional[str]
-    refresh_token: Optional[str]
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+# The signed identity in an access token (see utils.create_access_token), no database needed
+class CurrentUser(BaseModel):
+    user_id: int
+    email: Optional[str] = None
+    user_type: str
+    auth_method: Optional[str] = None
+    is_banned: Optional[bool] = False
+    name: Optional[str] = None
+    picture: Optional[str] = None
+    sid: Optional[int] = None # user_sessions.session_id, None in tokens made before sessions
+
 class BlogCreate(BaseModel):
     title: str
     content: str
@@ -100,6 +110,7 @@ class BlogSpecificResponse(BaseModel):
 
 class CommentCreate(BaseModel):
     content: str
+    parent_comment_id: Optional[int] = None # reply to this comment of the same blog
 
 class CommentResponse(BaseModel):
     comment_id: int
@@ -113,6 +124,12 @@ class CommentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# A comment with its replies, see crud.get_comment_threads
+class CommentThreadResponse(CommentResponse):
+    parent_comment_id: Optional[int] = None
+    reply_count: int = 0 # all replies below a top-level comment, more than shown when the thread was capped
+    replies: list["CommentThreadResponse"] = []
+
 #For creating an action (e.g., banning a user or hiding content).
 class AdminActionRequest(BaseModel):
     target_user_id: Optional[int] = None
@@ -150,6 +167,8 @@ class SearchResult(BaseModel):
     likes: int
     dislikes: int
     date: datetime
+    score: Optional[float] = None # full text relevance
+    snippet: Optional[str] = None # matched text with <mark></mark> around the hits
 
     class Config:
         from_attributes = True
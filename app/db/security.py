@@ -1,9 +1,11 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from pydantic import ValidationError
 from typing import Optional
 from app.utils import constants
 from app.db import schemas, crud, database
+from app.db.session_revocations import session_revocations
 
 from sqlalchemy.orm import Session
 
@@ -35,22 +37,25 @@ async def get_current_user(
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token", auto_error=False)  # auto_error=False to avoid automatic 401
 
-def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Optional[schemas.UserResponse]:
+# Identity comes from the signed access token claims (utils.create_access_token), so authenticating
+# a request never touches the database. Access tokens live ACCESS_TOKEN_EXPIRE_MINUTES, which bounds how
+# long a role change or ban takes to show up here; crud.get_user_cached serves anything not in the claims.
+def get_current_user(token: Optional[str] = Depends(oauth2_scheme)) -> Optional[schemas.CurrentUser]:
     if not token:
         return None
-    
+
     try:
         payload = jwt.decode(token, constants.SECRET_KEY, algorithms=[constants.ALGORITHM]) # type: ignore
-        user_id: int = payload.get("sub") # type: ignore
-        if user_id is None:
-            return None
-        # Fetch user from database (example)
-        from app.db.crud import get_user_by_id
-        from app.db.database import get_db
-        db = next(get_db())
-        user = get_user_by_id(db, user_id)
-        if user is None:
-            return None
-        return schemas.UserResponse.from_orm(user)
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+    # refresh tokens carry "sub" and no user_id, so they can't be used as access tokens
+    if payload.get("user_id") is None or payload.get("user_type") is None:
+        return None
+    # logged out or revoked for reuse, in-memory set refreshed in the background (app/db/session_revocations.py)
+    if payload.get("sid") is not None and session_revocations.is_revoked(payload["sid"]):
+        return None
+    try:
+        return schemas.CurrentUser.model_validate(payload)
+    except ValidationError:
+        return None
@@ -0,0 +1,122 @@
+# Revoked user_sessions, kept in memory per worker for get_current_user (app/db/security.py)
+# Access tokens carry their session id ("sid") and are checked without a database hit, so a logout or a
+# detected token reuse has to reach every worker some other way: a background task reads the revocations
+# made since its last poll (partial index on revoked_at) every SESSION_REVOCATION_POLL_SECONDS, revocations
+# made by this worker are added right away. An access token outlives its session by at most one poll.
+# Only revocations younger than an access token are kept (older sessions have no valid access token left),
+# so the set stays small and exact, no bloom filter needed.
+# The same task deletes sessions that expired more than a day ago, every SESSION_PRUNE_INTERVAL_SECONDS.
+
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+
+from sqlalchemy import TIMESTAMP, Interval, bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db.database import async_engine
+from app.utils import constants
+
+logger = logging.getLogger(__name__)
+
+SESSION_REVOCATION_POLL_SECONDS = float(os.getenv("SESSION_REVOCATION_POLL_SECONDS", "5"))
+SESSION_PRUNE_INTERVAL_SECONDS = float(os.getenv("SESSION_PRUNE_INTERVAL_SECONDS", "3600"))
+POLL_OVERLAP = timedelta(seconds=10) # a revocation committed late (revoked_at is its transaction's start) is still read
+
+# revoked_at is written with now(), a TIMESTAMP in the server's time zone: since and the window are compared in SQL
+NEWLY_REVOKED = text("""
+SELECT session_id, revoked_at FROM user_sessions
+WHERE revoked_at > coalesce(:since, localtimestamp - :window)
+""").bindparams(bindparam("since", type_=TIMESTAMP), bindparam("window", type_=Interval))
+
+PRUNE_EXPIRED = text("DELETE FROM user_sessions WHERE expires_at < localtimestamp - interval '1 day'")
+
+
+class SessionRevocations:
+    def __init__(self, interval: float = SESSION_REVOCATION_POLL_SECONDS,
+                 prune_interval: float = SESSION_PRUNE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.prune_interval = prune_interval
+        # an access token lives ACCESS_TOKEN_EXPIRE_MINUTES, the poll and its overlap come on top
+        self.window = timedelta(minutes=constants.ACCESS_TOKEN_EXPIRE_MINUTES, seconds=interval) + POLL_OVERLAP
+        self.revoked: dict = {} # session_id -> revoked_at
+        self.newest = None # newest revoked_at read, the poll's clock
+        self.task = None
+        self.polls = 0
+        self.failed_polls = 0
+        self.last_poll = 0.0
+        self.rejected = 0
+        self.pruned_sessions = 0
+
+    def add(self, session_id: int, revoked_at):
+        # revoked by this worker, the poll would only see it later
+        self.revoked[session_id] = revoked_at
+
+    def is_revoked(self, session_id) -> bool:
+        # called from the threadpool (sync get_current_user), the dict is only replaced or added to
+        if session_id in self.revoked:
+            self.rejected += 1
+            return True
+        return False
+
+    async def poll(self):
+        since = self.newest - POLL_OVERLAP if self.newest is not None else None
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(NEWLY_REVOKED, {"since": since, "window": self.window})).all()
+        for session_id, revoked_at in rows:
+            self.revoked[session_id] = revoked_at
+            if self.newest is None or revoked_at > self.newest:
+                self.newest = revoked_at
+        if self.newest is not None:
+            cutoff = self.newest - self.window
+            if any(revoked_at < cutoff for revoked_at in self.revoked.values()):
+                self.revoked = {sid: revoked_at for sid, revoked_at in self.revoked.items() if revoked_at >= cutoff}
+        self.polls += 1
+        self.last_poll = time.monotonic()
+
+    async def prune(self):
+        async with async_engine.begin() as conn:
+            result = await conn.execute(PRUNE_EXPIRED)
+        self.pruned_sessions += result.rowcount
+
+    async def run(self):
+        next_prune = time.monotonic() + self.prune_interval
+        while True:
+            try:
+                await self.poll()
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + self.prune_interval
+                    await self.prune()
+            except (SQLAlchemyError, OSError) as e: # keep polling after a lost connection
+                self.failed_polls += 1
+                logger.error(f"Failed to read revoked sessions: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="session-revocations")
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    def stats(self) -> dict:
+        return {
+            "revoked_sessions": len(self.revoked),
+            "polls": self.polls,
+            "failed_polls": self.failed_polls,
+            "seconds_since_poll": time.monotonic() - self.last_poll if self.last_poll else 0,
+            "rejected_access_tokens": self.rejected,
+            "pruned_sessions": self.pruned_sessions,
+        }
+
+
+session_revocations = SessionRevocations()
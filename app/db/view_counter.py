@@ -0,0 +1,115 @@
+# Write-behind view counter for GET /blogs/{blog_id}
+# Views are counted in memory per blog and written in one batched UPDATE ... SET num_views = num_views + n,
+# so reading a blog is a plain SELECT instead of a row locking write transaction.
+# Crash-loss bound: a worker that dies loses at most VIEW_FLUSH_MAX_PENDING views / VIEW_FLUSH_INTERVAL_SECONDS of views.
+
+import logging
+import os
+import threading
+from collections import Counter
+
+from sqlalchemy import Integer, column, func, update, values
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL_SECONDS = float(os.getenv("VIEW_FLUSH_INTERVAL_SECONDS", "5"))
+VIEW_FLUSH_MAX_PENDING = int(os.getenv("VIEW_FLUSH_MAX_PENDING", "1000")) # flush early once this many views are pending
+
+
+class ViewCounter:
+    def __init__(self, interval: float = VIEW_FLUSH_INTERVAL_SECONDS, max_pending: int = VIEW_FLUSH_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending_views: Counter = Counter()
+        self.pending_total = 0
+        self.flushed_total = 0
+        self.failed_flushes = 0
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+
+    def record(self, blog_id: int):
+        with self.lock:
+            self.pending_views[blog_id] += 1
+            self.pending_total += 1
+            full = self.pending_total >= self.max_pending
+        if full:
+            self.wake.set()
+
+    def pending(self, blog_id: int) -> int:
+        with self.lock:
+            return self.pending_views.get(blog_id, 0)
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending_views = self.pending_views, Counter()
+            self.pending_total = 0
+        if not batch:
+            return 0
+
+        # one statement for the whole batch: UPDATE blogs SET num_views = num_views + v.n FROM (VALUES ...) v
+        # sorted by blog_id so concurrent workers lock rows in the same order
+        views = values(column("blog_id", Integer), column("n", Integer), name="v").data(sorted(batch.items()))
+        statement = (
+            update(models.Blog)
+            .where(models.Blog.blog_id == views.c.blog_id)
+            .values(num_views=func.coalesce(models.Blog.num_views, 0) + views.c.n)
+            .execution_options(synchronize_session=False) # nothing to sync, no RETURNING needed
+        )
+        db = SessionLocal()
+        try:
+            db.execute(statement)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            # keep the views for the next flush instead of dropping them
+            with self.lock:
+                self.pending_views.update(batch)
+                self.pending_total += sum(batch.values())
+                self.failed_flushes += 1
+            logger.error(f"Failed to flush {len(batch)} blog view counts: {e}")
+            return 0
+        finally:
+            db.close()
+
+        with self.lock:
+            self.flushed_total += sum(batch.values())
+        return len(batch)
+
+    def run(self):
+        while not self.stopping:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+
+    def start(self):
+        if self.thread is None:
+            self.stopping = False
+            self.thread = threading.Thread(target=self.run, name="view-counter-flush", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        # on shutdown: stop the flush loop, then write whatever is still pending
+        self.stopping = True
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "pending": self.pending_total,
+                "pending_blogs": len(self.pending_views),
+                "flushed": self.flushed_total,
+                "failed_flushes": self.failed_flushes,
+            }
+
+
+view_counter = ViewCounter()
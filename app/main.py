@@ -1,36 +1,53 @@
 # FastAPI (main.py) - Google Login (Simplified)
 
+from contextlib import asynccontextmanager
 from datetime import timedelta
 import logging
 from fastapi import FastAPI, HTTPException, Depends, Request, Response, status, Query
-from fastapi.responses import RedirectResponse
-import httpx  # For making HTTP requests
+from fastapi.responses import PlainTextResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
+import httpx  # For making HTTP requests, through the shared app.utils.http_client
 import os
-from jose import jwt
-from jose.exceptions import ExpiredSignatureError, JWTError
+from jose.exceptions import JWTError
 
 from urllib.parse import urlencode
 
 from pydantic import BaseModel
 
-from app.routers import search, login_history, admin_actions, comments, blogs, users
+from app.routers import search, login_history, admin_actions, comments, blogs, users, profiling
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.db.database import SessionLocal
-from app.db import schemas, crud
+from app.db.database import get_async_db, engine, async_engine, pool_stats
+from app.db import schemas, crud, crud_async, query_log
 from app.db.events import update_updated_at_before_update #set event listener
+from app.db.view_counter import view_counter
+from app.db.login_history_writer import login_history_writer
+from app.db.session_revocations import session_revocations
 
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.utils import utils, constants
-
-app = FastAPI()
+from app.utils import utils, constants, metrics, http_client, google_id_token
+from app.utils.profiling import ProfileMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    view_counter.start()
+    login_history_writer.start()
+    http_client.start()
+    session_revocations.start()
+    yield
+    await session_revocations.stop()
+    await http_client.stop()
+    # write the blog views and login records still held in memory before the worker exits
+    await login_history_writer.stop()
+    await run_in_threadpool(view_counter.stop)
 
 ##### The simplest way to protect access to /docs and /redoc #####
-app = FastAPI(docs_url="/docs" if os.getenv("ENVIRONMENT") != "production" else None,
-             redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None)
+app = FastAPI(lifespan=lifespan,
+              docs_url="/docs" if os.getenv("ENVIRONMENT") != "production" else None,
+              redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None)
 
 
 ##### you need user name and password to access: https://gemini.google.com/app/5b577630420cefaa
@@ -44,8 +61,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"], # cursor of the next page for GET /blogs, validators for If-None-Match
 )
 
+# slow query log, N+1 warnings and DB time per request (app/db/query_log.py)
+query_log.instrument_engine(engine)
+query_log.instrument_engine(async_engine.sync_engine)
+
+# sampling profiler, ?profile=1 on a request or /debug/profiles for a route, never in production (like /docs)
+if os.getenv("ENVIRONMENT") != "production":
+    app.add_middleware(ProfileMiddleware)
+    app.include_router(profiling.profile_router)
+
+# request count/latency/DB time per route for GET /metrics, outermost so it times everything
+# (always on, query_log needs it to tie statements to a request, METRICS_ENABLED only hides /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+if metrics.METRICS_ENABLED:
+    metrics.add_collector("db_pool", pool_stats)
+    metrics.add_collector("query_log", query_log.stats)
+    metrics.add_collector("user_cache", crud.user_cache.stats)
+    metrics.add_collector("blog_list_cache", crud.blog_list_cache.stats)
+    metrics.add_collector("view_counter", view_counter.stats)
+    metrics.add_collector("login_history_writer", login_history_writer.stats)
+    metrics.add_collector("outbound_http", http_client.stats)
+    metrics.add_collector("google_jwks", google_id_token.jwks_cache.stats)
+    metrics.add_collector("session_revocations", session_revocations.stats)
+
 # Register routers
 app.include_router(users.user_router)
 app.include_router(blogs.blog_router)
@@ -54,20 +95,19 @@ app.include_router(admin_actions.admin_router)
 app.include_router(login_history.login_router)
 app.include_router(search.search_router)
 
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # see https://chatgpt.com/c/67e59e66-4d78-800a-8baa-35c635b6b1d7
 logger = logging.getLogger(__name__)
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    # Prometheus text format, scrape each worker
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/login/google")
 async def google_login(whereFrom: str = Query(None)):
-    logger.info("===> google_login(", whereFrom, ") is called")
+    logger.info(f"===> google_login({whereFrom}) is called")
     params =  {
                                     "client_id": constants.GOOGLE_CLIENT_ID,
                                     "redirect_uri": constants.GOOGLE_REDIRECT_URI,
@@ -82,8 +122,8 @@ async def google_login(whereFrom: str = Query(None)):
     return RedirectResponse(auth_url)
 
 @app.get("/login/google/callback")
-async def google_callback(request: Request, code: str = Query(None), error: str = Query(None), state: str = Query(None), db: Session = Depends(get_db)):
-    logger.info("===> google_callback(", code, state, ") is called")
+async def google_callback(request: Request, code: str = Query(None), error: str = Query(None), state: str = Query(None), db: AsyncSession = Depends(get_async_db)):
+    logger.info(f"===> google_callback(state={state}) is called")
     if error:
         raise HTTPException(status_code=400, detail=f"Google OAuth error: {error}")
     
@@ -91,7 +131,7 @@ async def google_callback(request: Request, code: str = Query(None), error: str
         raise HTTPException(status_code=400, detail="Authorization code is missing")
     
     # for login_history with client information
-    client_info = utils.get_client_info(request)
+    client_info = await run_in_threadpool(utils.get_client_info, request)
 
     token_data = {
                                     "client_id": constants.GOOGLE_CLIENT_ID,
@@ -101,113 +141,87 @@ async def google_callback(request: Request, code: str = Query(None), error: str
                                     "redirect_uri": constants.GOOGLE_REDIRECT_URI,
                                  }
     try:
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(constants.GOOGLE_TOKEN_URL, data=token_data)
-            token_response.raise_for_status()
-            tokens = token_response.json()
-
+        # pooled keep-alive connections to Google, shared by all logins of this worker
+        client = http_client.get_client()
+        token_response = await client.post(constants.GOOGLE_TOKEN_URL, data=token_data)
+        token_response.raise_for_status()
+        tokens = token_response.json()
+
+        # the claims are in the id_token already: verified locally against Google's cached keys, no extra round trip
+        user_info = None
+        if tokens.get("id_token"):
+            try:
+                user_info = await google_id_token.verify(tokens["id_token"], tokens.get("access_token"))
+            except JWTError as e:
+                logger.warning(f"id_token not verified, asking userinfo instead: {e}")
+        if user_info is None:
             user_info_response = await client.get(constants.GOOGLE_USERINFO_URL, headers={"Authorization": f"Bearer {tokens['access_token']}"},)
             user_info_response.raise_for_status()
             user_info = user_info_response.json()
 
-            logger.info("===> user_info: ", user_info)
-
-            # Check if user exists in the database
-            user = crud.get_user_by_email(db, user_info.get("email"))
-            logger.info("user returned from table: ", user)
-            
-            #Just insert a new record if not existing in table
-            if not user:
-                # Add the user if not found
-                new_user = schemas.UserCreate(
-                    email=user_info.get("email"),
-                    password="",
-                    user_type="general", # general, od, md, admin
-                    auth_method="google",
-                    google_id=user_info.get("sub"),
-                    name=user_info.get("name"),
-                    picture=user_info.get("picture")
-                )
-                user = crud.create_user(db, new_user)
-                logger.info("===> created user:", user)
-
-            client_info['user_id'] = user.user_id # type: ignore
-
-            access_token = utils.create_access_token(
-            {     
-                "user_id": user.user_id, # type: ignore               
-                "email": user.email, # type: ignore
-                "user_type": user.user_type,  # type: ignore
-                "auth_method":user.auth_method,  # type: ignore
-                "is_banned":user.is_banned, # type: ignore
-                "name": user.name, # type: ignore
-                "picture": user.picture # type: ignore
-            })
-            
-            #print("New user object:", new_user.dict())
-            refresh_token = utils.create_refresh_token(user.user_id, user.email) # type: ignore
-
-            # Store the refresh token in the database (optional but safer)
-            user = crud.update_user_refresh_token(db, user.user_id, refresh_token) # type: ignore
-            
-            #login history
-            crud.create_login_history(db, client_info)
-
-            redirect_url = f"{constants.FLUTTER_HOST_URL}/#/login?jwt={access_token}&refresh={refresh_token}"
-            if state:  # If 'from' parameter exists, append it to the redirect URL
-                redirect_url += f"&whereFrom={state}&doit=1"
-
-            return RedirectResponse(url=redirect_url)
+        logger.info(f"===> user_info: {user_info}")
+
+        # find or create the user, open a session for this device and write the login_history row: one statement, see crud_async
+        user, refresh_token = await crud_async.login_google_user(db, user_info, client_info)
+        logger.info(f"user logged in: {user.user_id}")
+
+        access_token = create_session_access_token(user)
+
+        redirect_url = f"{constants.FLUTTER_HOST_URL}/#/login?jwt={access_token}&refresh={refresh_token}"
+        if state:  # If 'from' parameter exists, append it to the redirect URL
+            redirect_url += f"&whereFrom={state}&doit=1"
+
+        return RedirectResponse(url=redirect_url)
     except httpx.HTTPStatusError as e:
         logger.error(f"httpx.HTTPStatusError: {e}") # full stack trace then add logger.error(f"..", exc_info=True).
+        login_history_writer.record(client_info, is_success=False, failure_reason=f"google_http_{e.response.status_code}")
         raise HTTPException(status_code=e.response.status_code, detail="Failed to communicate with Google OAuth")
+    except httpx.RequestError as e: # connect/read/pool timeouts of http_client, network errors
+        logger.error(f"httpx.RequestError: {e!r}")
+        login_history_writer.record(client_info, is_success=False, failure_reason="google_unreachable")
+        raise HTTPException(status_code=502, detail="Google OAuth is not reachable")
     except SQLAlchemyError as e:
-        db.rollback() # safe in SQLALchemy
+        await db.rollback() # safe in SQLALchemy
         logger.error(f"SQLAlchemyError: {e}")
+        login_history_writer.record(client_info, is_success=False, failure_reason="database_error")
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
         logger.error(f"Exception: {e}", exc_info=True)
+        # failed logins are written in the background, the login transaction was rolled back
+        login_history_writer.record(client_info, is_success=False, failure_reason=type(e).__name__)
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
         
      
+def create_session_access_token(user) -> str:
+    # user: a row of crud_async.login_google_user/rotate_refresh_token, sid lets get_current_user drop revoked sessions
+    return utils.create_access_token(
+        {
+            "user_id": user.user_id,
+            "email": user.email,
+            "user_type": user.user_type,
+            "auth_method":user.auth_method,
+            "is_banned":user.is_banned,
+            "name": user.name,
+            "picture": user.picture,
+            "sid": user.session_id,
+        })
+
 class RefreshTokenRequest(BaseModel):
     refresh_token: str
-    
+
+# Refresh tokens are single use: the response has the next one, which the client has to keep instead.
+# A token sent again after it was rotated revokes its session (copied token), see crud_async.rotate_refresh_token.
 @app.post("/refresh")
-async def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
-    try:
-        refresh_token = request.refresh_token
-        print("--- 0 ---", refresh_token)
-
-        payload = jwt.decode(refresh_token, constants.SECRET_KEY, algorithms=[constants.ALGORITHM]) # type: ignore
-        print("--- 0.1 ---", payload)
-        user_id = payload.get("sub")
-        print("--- 0.2 ---", user_id)
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid refresh token no user_id")
-        print("--- 1 ---")
-        # Verify the refresh token is valid and matches the one in the database
-        user = crud.get_user_by_id(db, int(user_id))
-        if not user or user.refresh_token != refresh_token: # type: ignore
-            #print("user: ", user, " user.refresh_token=", user.refresh_token) # type: ignore
-            raise HTTPException(status_code=401, detail="Invalid refresh token, no user object or different refresh_token")
-        print("--- 2 ---")
-        # Generate a new access token
-        new_access_token = utils.create_access_token(
-            {
-                "user_id": user.user_id, 
-                "email": user.email,
-                "user_type": user.user_type, 
-                "auth_method":user.auth_method, 
-                "is_banned":user.is_banned,
-                "picture": user.picture
-            })
-        print("--- 3 ---")
-        return {"access_token": new_access_token}
-
-    except ExpiredSignatureError as e:
-        logger.error(f"ExpiredSignatureError: {e}")
-        raise HTTPException(status_code=401, detail="Refresh token has expired")
-    except JWTError as e:
-        logger.error(f"JWTError: {e}")
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
+async def refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    user, new_refresh_token = await crud_async.rotate_refresh_token(db, request.refresh_token)
+    return {"access_token": create_session_access_token(user), "refresh_token": new_refresh_token}
+
+class LogoutRequest(BaseModel):
+    refresh_token: str
+    all_devices: bool = False
+
+@app.post("/logout")
+async def logout(request: LogoutRequest, db: AsyncSession = Depends(get_async_db)):
+    # revokes the session of this refresh token (all_devices: every session of its user), its access tokens stop working too
+    revoked = await crud_async.logout(db, request.refresh_token, request.all_devices)
+    return {"message": "Logged out", "revoked_sessions": revoked}
@@ -1,12 +1,15 @@
 # API Routes for FastAPI with SQLAlchemy
 
+import hashlib
+from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from app.db.security import get_current_user
-from app.db import crud, schemas, database, models
+from app.db import crud, schemas, database
+from app.utils import fast_json, http_cache, utils
+from app.db.view_counter import view_counter
 
 
 db_dependency = Depends(database.get_db)
@@ -25,7 +28,7 @@ def react_to_blog(
     blog_id: int,
     reaction: schemas.BlogReactionCreate,
     db: Session = db_dependency,
-    current_user: schemas.UserResponse = Depends(get_current_user)
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
     
     if reaction.reaction_type not in ["like", "dislike"]:
@@ -37,32 +40,53 @@ def react_to_blog(
 def get_my_reaction(
     blog_id: int,
     db: Session = db_dependency,
-    current_user: schemas.UserResponse = Depends(get_current_user)
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
     
     reaction = crud.get_user_reaction(db, blog_id, current_user.user_id)
     return reaction
 
+# Weak ETag of a blog detail response, over crud.BLOG_ETAG_COLUMNS + BLOG_AUTHOR_ETAG_COLUMNS (content is
+# covered by updated_at). num_views is left out on purpose: every read bumps it, so it would never validate,
+# and the count is approximate anyway (write-behind, see view_counter). The body still carries it, so two
+# responses with one ETag may differ in num_views: weak, and the client keeps its older count on a 304.
+# The reaction is in it because the body carries the caller's own reaction.
+def blog_etag(values: tuple, user_reaction):
+    return http_cache.make_etag("blog", *values, user_reaction, weak=True)
+
 @blog_router.get("/{blog_id}", response_model=schemas.BlogSpecificResponse)
 def read_blog(
     blog_id: int, 
+    request: Request,
+    response: Response,
     db: Session = db_dependency,
-    current_user: schemas.UserResponse = Depends(get_current_user, use_cache=False)):
+    current_user: Optional[schemas.CurrentUser] = Depends(get_current_user)):
+
+    # the body differs per user (user_reaction), so only the browser may cache it, and only after revalidating
+    cache_control = "private, no-cache" if current_user else "no-cache"
+
+    # Add user's reaction only if authenticated
+    reaction = crud.get_user_reaction(db, blog_id, current_user.user_id) if current_user else None
+    user_reaction = reaction.reaction_type if reaction else None
+
+    # Revalidation: compare against a small validator query, no content loaded or serialized
+    if request.headers.get("if-none-match"):
+        validator = crud.get_blog_validator(db, blog_id)
+        if validator is None:
+            raise HTTPException(status_code=404, detail="Blog not found with ${blog_id}")
+        etag = blog_etag(tuple(validator), user_reaction)
+        if http_cache.etag_matches(request, etag):
+            view_counter.record(blog_id) # still a read
+            return http_cache.not_modified(etag, cache_control, vary="Authorization")
 
     db_blog = crud.get_blog(db, blog_id)
     if db_blog is None:
         raise HTTPException(status_code=404, detail="Blog not found with ${blog_id}")
     
-    # Add user's reaction only if authenticated
-
-    if current_user:
-        print("--1--")
-        reaction = crud.get_user_reaction(db, blog_id, current_user.user_id)
-        db_blog.user_reaction = reaction.reaction_type if reaction else None
-    else:
-        print("--2--")
-        db_blog.user_reaction = None
-    
+    db_blog.user_reaction = user_reaction
+    http_cache.set_validators(
+        response, blog_etag(crud.blog_etag_values(db_blog), user_reaction),
+        cache_control, vary="Authorization")
     return db_blog
 
 #############
@@ -70,32 +94,58 @@ def read_blog(
 # fixed from https://grok.com/chat/c7c3ed2c-9cbd-4da8-b253-912ca626564c
 @blog_router.get("/", response_model=list[schemas.BlogListResponse])
 def read_blogs(
+    request: Request,
     visibility: Optional[str] = Query(None, description="Filter by visibility (public/doctor)"),
     is_hidden: Optional[bool] = Query(None, description="Filter by hidden status (True/False)"),
     page: int = Query(1, ge=1, description="Page number, starting from 1"),
     per_page: int = Query(10, ge=1, le=100, description="Number of records per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page, replaces page"),
     db: Session = db_dependency
 ):
-    
-    query = db.query(models.Blog)
-    if visibility and visibility in ['public', 'doctor']:
-        query = query.filter(models.Blog.visibility == visibility.lower())
-    if is_hidden is not None:
-        query = query.filter(models.Blog.is_hidden == is_hidden)
-
-    # Soft delete filter (optional but recommended)
-    query = query.filter(models.Blog.deleted_at == None)
-
-    # Order by most recent
-    query = query.order_by(desc(models.Blog.updated_at), desc(models.Blog.blog_id))
-    
-    # Pagination
-    offset = (page - 1) * per_page
-    blogs = query.offset(offset).limit(per_page).all()
-
-    #print(f"Page {page}, Per_page {per_page}: {[blog.title for blog in blogs]}")
-    
-    return blogs
+    if visibility not in ['public', 'doctor']:
+        visibility = None
+
+    # Keyset pagination on (updated_at, blog_id) when a cursor is given, page/per_page otherwise
+    after = None
+    if cursor:
+        try:
+            updated_at, blog_id = utils.decode_cursor(cursor)
+            after = (datetime.fromisoformat(updated_at), int(blog_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Served from crud.blog_list_cache when possible: the page is cached already serialized, with its ETag
+    key = (visibility, is_hidden, per_page, cursor or page)
+    listing = crud.blog_list_cache.get(key)
+    if listing is None:
+        # read before the query: an edit committed while it runs makes set() drop this page instead of caching old rows
+        generation = crud.blog_list_cache.generation
+        # one extra row tells whether there is a next page
+        blogs = crud.get_blogs(db, visibility, is_hidden, limit=per_page + 1, offset=(page - 1) * per_page, after=after)
+        next_cursor = None
+        if len(blogs) > per_page:
+            blogs = blogs[:per_page]
+            next_cursor = utils.encode_cursor(blogs[-1].updated_at, blogs[-1].blog_id)
+
+        body = fast_json.dump_models(schemas.BlogListResponse, blogs)
+        listing = {
+            "body": body,
+            "next_cursor": next_cursor,
+            # over the serialized page itself, so any change of what it shows (author included) is a new ETag
+            "etag": http_cache.make_etag("blogs", next_cursor, hashlib.sha256(body).hexdigest()),
+            "blog_ids": frozenset(b.blog_id for b in blogs), # for crud.invalidate_blog_listing(blog_id)
+        }
+        crud.blog_list_cache.set(key, listing, generation)
+
+    # only public listings may sit in shared caches
+    cache_control = f"public, max-age={http_cache.BLOG_LIST_MAX_AGE}" if visibility == "public" else "private, no-cache"
+    if http_cache.etag_matches(request, listing["etag"]):
+        return http_cache.not_modified(listing["etag"], cache_control)
+    response = Response(content=listing["body"], media_type="application/json")
+    if listing["next_cursor"]:
+        response.headers["X-Next-Cursor"] = listing["next_cursor"]
+    http_cache.set_validators(response, listing["etag"], cache_control)
+    return response
 
 # Add patch and delete endpoints
 @blog_router.patch("/{blog_id}", response_model=schemas.BlogSpecificResponse)
@@ -117,7 +167,7 @@ def delete_blog_endpoint(blog_id: int, db: Session = db_dependency):
 @blog_router.post("/", response_model=schemas.BlogSpecificResponse)
 def create_blog(
     blog: schemas.BlogCreate,
-    current_user: schemas.UserResponse = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
     db: Session = db_dependency
 ):
     if current_user.user_type not in ["doctor", "admin"]:
@@ -1,8 +1,11 @@
 # API Routes for FastAPI with SQLAlchemy
 
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.db import crud, schemas, database
+from app.utils import utils
 
 
 db_dependency = Depends(database.get_db)
@@ -32,6 +35,27 @@ def create_comment(
 ):
     return crud.create_comment(db, comment, blog_id, user_id=1)  # Temp user_id - replace with auth
 
-@comment_router.get("/", response_model=list[schemas.CommentResponse])
-def read_comments(blog_id: int, db: Session = db_dependency):
-    return crud.get_comments_by_blog(db, blog_id)
+# Threads of top-level comments, oldest first, each with up to `replies` replies nested below it
+@comment_router.get("/", response_model=list[schemas.CommentThreadResponse])
+def read_comments(
+    blog_id: int,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="Number of top-level comments per page"),
+    replies: int = Query(10, ge=0, le=100, description="Max replies returned per thread"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    db: Session = db_dependency
+):
+    after = None
+    if cursor:
+        try:
+            created_at, comment_id = utils.decode_cursor(cursor)
+            after = (datetime.fromisoformat(created_at), int(comment_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # one extra thread tells whether there is a next page
+    threads = crud.get_comment_threads(db, blog_id, limit=limit + 1, reply_cap=replies, after=after)
+    if len(threads) > limit:
+        threads = threads[:limit]
+        response.headers["X-Next-Cursor"] = utils.encode_cursor(threads[-1].created_at, threads[-1].comment_id)
+    return threads
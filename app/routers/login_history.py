@@ -1,8 +1,12 @@
 # API Routes for FastAPI with SQLAlchemy
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.db import crud, schemas, database
+from app.db.security import get_current_user
+from app.utils.streaming import STREAM_MAX_ROWS, ndjson_response
 
 
 db_dependency = Depends(database.get_db)
@@ -14,5 +18,19 @@ login_router = APIRouter(prefix="/login-history", tags=["Login History"])
 def read_login_history(user_id: int, db: Session = db_dependency):
     return crud.get_login_history(db, user_id)
 
+# Bulk export, streamed as NDJSON (one record per line) instead of one big list
+@login_router.get("/user/{user_id}/export", response_class=StreamingResponse)
+def export_login_history(
+    user_id: int,
+    max_results: int = Query(STREAM_MAX_ROWS, ge=1, le=STREAM_MAX_ROWS),
+    current_user: Optional[schemas.CurrentUser] = Depends(get_current_user)
+):
+    if current_user is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    # Only the user themselves or admins
+    if current_user.user_id != user_id and current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return ndjson_response(crud.stream_login_history, user_id, max_rows=max_results)
+
 
 # Now you have API routes hooked up to your CRUD functions! 🚀
\ No newline at end of file
@@ -0,0 +1,34 @@
+# Profiles summed over many requests to one route, only included when ENVIRONMENT != "production"
+# see app/utils/profiling.py, single requests are profiled with ?profile=1 instead
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from app.utils import profiling
+
+profile_router = APIRouter(prefix="/debug/profiles", tags=["Profiling"])
+
+# e.g. POST /debug/profiles/?route=/blogs/{blog_id}&requests=200, then load the route
+@profile_router.post("/")
+def arm_profile(route: str = Query(..., description="route template, e.g. /blogs/{blog_id}"), method: str = "GET",
+                requests: int = Query(100, ge=1, le=profiling.PROFILE_MAX_REQUESTS)):
+    return profiling.arm(method, route, requests).summary()
+
+@profile_router.get("/")
+def read_profiles():
+    with profiling.lock:
+        return [profile.summary() for profile in profiling.route_profiles.values()]
+
+# the collapsed stack file so far (complete once remaining is 0)
+@profile_router.get("/download")
+def download_profile(route: str, method: str = "GET"):
+    profile = profiling.get_profile(method, route)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Route not armed")
+    with profiling.lock:
+        body = profiling.render(profile.stacks)
+    return Response(body, media_type="text/plain", headers={
+        "Content-Disposition": f'attachment; filename="{profiling.file_name(profile.method, profile.route)}"'})
+
+@profile_router.delete("/")
+def delete_profiles(route: str = None, method: str = None): # type: ignore
+    profiling.reset(method, route)
+    return {"message": "Profiles deleted"}
@@ -1,35 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.db import schemas, database
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, contains_eager, load_only
+from app.db import crud, schemas, database
 from app.db.models import Blog, User, Comment
+from app.utils import utils
+from app.utils.streaming import STREAM_MAX_ROWS, STREAM_YIELD_PER, ndjson_response
 
 
-db_dependency = Depends(database.get_db)
-
 search_router = APIRouter(prefix="/search", tags=["Search"])
 
+FORMAT_QUERY = Query("json", pattern="^(json|ndjson)$", description="ndjson: stream every match, one per line, up to max_results")
+
+# The request's session, json only: the ndjson stream opens its own (see app/utils/streaming.py)
+def search_db(format: str = FORMAT_QUERY):
+    if format == "ndjson":
+        yield None
+        return
+    yield from database.get_db()
+
 @search_router.get("/", response_model=list[schemas.SearchResult])
-def search(query: str = Query(..., min_length=1), include_author: bool = Query(False), db: Session = db_dependency):
+def search(
+    response: Response,
+    query: str = Query(..., min_length=1),
+    include_author: bool = Query(False),
+    mode: str = Query("fulltext", pattern="^(fulltext|substring)$", description="fulltext: ranked with snippets, substring: ILIKE match"),
+    limit: int = Query(20, ge=1, le=100, description="Max number of results"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (fulltext mode)"),
+    format: str = FORMAT_QUERY,
+    max_results: int = Query(STREAM_MAX_ROWS, ge=1, le=STREAM_MAX_ROWS, description="Cap of the ndjson stream"),
+    db: Optional[Session] = Depends(search_db)
+):
+    if format == "ndjson":
+        if mode == "substring":
+            return ndjson_response(substring_results, query, include_author, max_rows=max_results)
+        return ndjson_response(fulltext_results, query, include_author, max_rows=max_results)
+
+    if mode == "substring":
+        return substring_search(query, include_author, limit, db)
+
+    after = None
+    if cursor:
+        try:
+            score, hit_type, key = utils.decode_cursor(cursor)
+            after = (float(score), str(hit_type), int(key))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # one extra row tells whether there is a next page
+    hits = crud.search_fulltext(db, query, include_author, limit=limit + 1, after=after)
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers["X-Next-Cursor"] = utils.encode_cursor(hits[-1]["score"], hits[-1]["type"], hits[-1]["key"])
+
+    return [schemas.SearchResult(**{k: v for k, v in hit.items() if k != "key"}) for hit in hits]
+
+
+def substring_search(query: str, include_author: bool, limit: int, db: Session):
+    return list(substring_results(db, query, include_author, limit))
+
+# Generator, so the ndjson mode can stream it straight from the cursor
+# limit: most results in all, blogs first, comments fill the rest (None: every match)
+def substring_results(db: Session, query: str, include_author: bool, limit: Optional[int] = None):
 
     search_query = f"%{query}%"
     # Simplified search example
-    blog_query = db.query(Blog).join(User).filter(
+    # authors come from the join that is already there, and only the columns used below are loaded
+    blog_query = db.query(Blog).join(Blog.author).options(
+        load_only(Blog.blog_id, Blog.title, Blog.excerpt, Blog.likes, Blog.dislikes, Blog.updated_at),
+        contains_eager(Blog.author).load_only(User.name),
+    ).filter(
         (Blog.title.ilike(search_query)) |
         (Blog.content.ilike(search_query)) |
         (User.name.ilike(search_query) if include_author else False)
     )
 
-    comment_query = db.query(Comment).join(User).filter(
+    comment_query = db.query(Comment).join(Comment.user).options(
+        load_only(Comment.blog_id, Comment.content, Comment.likes, Comment.dislikes, Comment.created_at),
+        contains_eager(Comment.user).load_only(User.name),
+    ).filter(
         (Comment.content.ilike(search_query)) |
         (User.name.ilike(search_query) if include_author else False)
     )
 
-    blogs = blog_query.all()
-    comments = comment_query.all()
+    if limit is not None:
+        blog_query = blog_query.limit(limit)
 
-    results = []
-    for blog in blogs:
-        results.append(schemas.SearchResult(
+    # yield_per: server-side cursor, rows are fetched (and released) in batches instead of all at once
+    blogs = 0
+    for blog in blog_query.yield_per(STREAM_YIELD_PER):
+        blogs += 1
+        yield schemas.SearchResult(
             type="blog",
             id=blog.blog_id, # type: ignore
             title=blog.title, # type: ignore
@@ -38,10 +98,15 @@ def search(query: str = Query(..., min_length=1), include_author: bool = Query(F
             likes=blog.likes, # type: ignore
             dislikes=blog.dislikes, # type: ignore
             date=blog.updated_at # type: ignore
-        ))
+        )
+
+    if limit is not None:
+        if blogs >= limit:
+            return
+        comment_query = comment_query.limit(limit - blogs)
 
-    for comment in comments:
-        results.append(schemas.SearchResult(
+    for comment in comment_query.yield_per(STREAM_YIELD_PER):
+        yield schemas.SearchResult(
             type="comment",
             id=comment.blog_id, # type: ignore
             content=comment.content, # type: ignore
@@ -49,6 +114,15 @@ def search(query: str = Query(..., min_length=1), include_author: bool = Query(F
             likes=comment.likes, # type: ignore
             dislikes=comment.dislikes, # type: ignore
             date=comment.created_at # type: ignore
-        ))
+        )
 
-    return results
\ No newline at end of file
+# Ranked results have to come in score order, so they are streamed page by page on the fulltext keyset
+def fulltext_results(db: Session, query: str, include_author: bool):
+    after = None
+    while True:
+        hits = crud.search_fulltext(db, query, include_author, limit=STREAM_YIELD_PER, after=after)
+        for hit in hits:
+            yield schemas.SearchResult(**{k: v for k, v in hit.items() if k != "key"})
+        if len(hits) < STREAM_YIELD_PER:
+            return
+        after = (hits[-1]["score"], hits[-1]["type"], hits[-1]["key"])
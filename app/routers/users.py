@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.db.security import get_current_user
-from app.db import models, crud, schemas, database
+from app.db import crud, schemas, database
 
 
 db_dependency = Depends(database.get_db)
@@ -22,7 +22,7 @@ def create_user(user: schemas.UserCreate, db: Session = db_dependency):
 
 @user_router.get("/{user_id}", response_model=schemas.UserResponse)
 def read_user(user_id: int, db: Session = db_dependency):
-    db_user = crud.get_user_by_id(db, user_id)
+    db_user = crud.get_user_cached(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
@@ -32,7 +32,7 @@ def update_user_role(
     user_id: int,
     role_update: schemas.UserRoleUpdate,  # New schema
     db: Session = db_dependency,
-    current_user: models.User = Depends(get_current_user)
+    current_user: schemas.CurrentUser = Depends(get_current_user)
 ):
     # Only allow admins or the user themselves to update the role
     if current_user.user_id != user_id and current_user.user_type != "admin": # type: ignore
@@ -0,0 +1,60 @@
+#run drkwon_backend>python -m app.test.bench_async_db --requests 500 --concurrency 50
+# Compares the old path (async def endpoint calling blocking crud) against crud_async on one event loop.
+# A heartbeat task measures how long the loop is stalled while queries are in flight.
+import argparse
+import asyncio
+import time
+
+from app.db import crud, crud_async
+from app.db.database import SessionLocal, AsyncSessionLocal
+
+
+async def sync_path(user_id: int):
+    db = SessionLocal()
+    try:
+        crud.get_user_by_id(db, user_id)  # blocks the event loop, like main.google_callback used to
+    finally:
+        db.close()
+
+async def async_path(user_id: int):
+    async with AsyncSessionLocal() as db:
+        await crud_async.get_user_by_id(db, user_id)
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+async def run(path, total: int, concurrency: int, user_id: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await path(user_id)
+
+    stop, lags = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return {
+        "requests_per_sec": round(total / elapsed, 1),
+        "elapsed_sec": round(elapsed, 3),
+        "max_loop_lag_ms": round(max(lags, default=0) * 1000, 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--user-id", type=int, default=1)
+    args = parser.parse_args()
+
+    print("sync crud in async def:", await run(sync_path, args.requests, args.concurrency, args.user_id))
+    print("crud_async            :", await run(async_path, args.requests, args.concurrency, args.user_id))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,193 @@
+#run drkwon_backend>python -m app.test.bench_http --requests 1000 --concurrency 32 --output bench_output.json
+# In-process HTTP load test: drives app.main.app through httpx's ASGI transport (lifespan included, no server,
+# no network) against the database in DATABASE_URL, seeded beforehand (python -m app.test.seed_bulk).
+# Prints/writes JSON with throughput and p50/p95/p99 latency per route; --compare a previous run to see the change.
+#   --routes blogs,blog,search,refresh   which routes to hit (default: all)
+#   --mock-oauth 9000 --oauth-latency-ms 40   also runs app.test.mock_oauth on that port and adds the "login"
+#       route (Google callback for many users), outbound connection reuse is in "outbound_http"
+#       --no-id-token: the mock sends no id_token, logins take the userinfo round trip instead
+# Note: the refresh route opens a user_sessions row per request (refresh tokens are single use) for the first user,
+# run it on a local database only.
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import func, insert
+
+from app.db import models
+from app.db.database import SessionLocal, engine
+from app.main import app
+from app.utils import utils, constants, http_client
+from app.test import mock_oauth
+
+SEARCH_TERMS = ["eye", "health", "vision", "glaucoma", "retina", "dry eyes", "contact lens", "children", "screen", "cataract"]
+
+
+def prepare(seed: int, sessions: int):
+    # ids and tokens the routes need, taken from whatever is seeded
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        counts = {
+            "users": db.query(func.count(models.User.user_id)).scalar(),
+            "blogs": db.query(func.count(models.Blog.blog_id)).scalar(),
+            "comments": db.query(func.count(models.Comment.comment_id)).scalar(),
+        }
+        max_blog_id = db.query(func.max(models.Blog.blog_id)).scalar() or 0
+        # random ids over the whole range (not the first N), sampled from what exists
+        blog_ids = [b for (b,) in db.query(models.Blog.blog_id).filter(
+            models.Blog.blog_id.in_([rng.randint(1, max_blog_id) for _ in range(2000)])) if max_blog_id]
+        user = db.query(models.User).order_by(models.User.user_id).first()
+        if not blog_ids or user is None:
+            sys.exit("Seed the database first: python -m app.test.seed_bulk")
+        # one session per /refresh request, each token is rotated once (a second use would be reuse)
+        refresh_tokens = [utils.new_refresh_token() for _ in range(sessions)]
+        if refresh_tokens:
+            db.execute(insert(models.UserSession).values(
+                expires_at=func.now() + timedelta(days=constants.REFRESH_TOKEN_EXPIRE_DAYS), device_id="bench_http"),
+                [{"user_id": user.user_id, "token_hash": token_hash} for _, token_hash in refresh_tokens])
+            db.commit()
+        access_token = utils.create_access_token({
+            "user_id": user.user_id, "email": user.email, "user_type": user.user_type,
+            "auth_method": user.auth_method, "is_banned": user.is_banned, "name": user.name, "picture": user.picture,
+        })
+        return counts, blog_ids, [token for token, _ in refresh_tokens], access_token
+    finally:
+        db.close()
+
+def route_requests(blog_ids, refresh_tokens: list, pages: int, users: int):
+    # route name -> function(rng) returning (method, url, json body)
+    return {
+        "login": lambda rng: ("GET", f"/login/google/callback?code=user{rng.randint(1, users)}", None),
+        "blogs": lambda rng: ("GET", f"/blogs/?per_page=20&page={rng.randint(1, pages)}", None),
+        "blog": lambda rng: ("GET", f"/blogs/{rng.choice(blog_ids)}", None),
+        "search": lambda rng: ("GET", f"/search/?query={rng.choice(SEARCH_TERMS)}&limit=20", None),
+        "refresh": lambda rng: ("POST", "/refresh", {"refresh_token": refresh_tokens.pop()}),
+    }
+
+def percentile(sorted_values: list, p: float) -> float:
+    # nearest rank
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))]
+
+async def bench_route(client, make_request, total: int, concurrency: int, warmup: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        method, url, body = make_request(rng)
+        await client.request(method, url, json=body)
+
+    latencies, statuses = [], Counter()
+    queue = [make_request(rng) for _ in range(total)]
+
+    async def worker():
+        while queue:
+            method, url, body = queue.pop()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                statuses[str(response.status_code)] += 1
+            except Exception as e: # count it and keep going, one failure shouldn't end the run
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 3)
+    return {
+        "requests": total,
+        "errors": sum(n for status, n in statuses.items() if not status.startswith(("2", "3"))),
+        "statuses": dict(statuses),
+        "throughput_rps": round(total / elapsed, 1),
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)),
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]),
+        },
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline: dict, result: dict):
+    for route, now in result["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before:
+            continue
+        change = lambda old, new: f"{old} -> {new} ({(new - old) / old * 100:+.1f}%)" if old else f"{old} -> {new}"
+        print(f"{route:8} rps {change(before['throughput_rps'], now['throughput_rps'])}, "
+              f"p50 {change(before['latency_ms']['p50'], now['latency_ms']['p50'])} ms, "
+              f"p99 {change(before['latency_ms']['p99'], now['latency_ms']['p99'])} ms", file=sys.stderr)
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", default="blogs,blog,search,refresh")
+    parser.add_argument("--requests", type=int, default=1000, help="per route")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=50, help="requests per route before measuring")
+    parser.add_argument("--pages", type=int, default=5, help="GET /blogs/ spreads over this many pages")
+    parser.add_argument("--auth", action="store_true", help="send a bearer access token with every request")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON here as well")
+    parser.add_argument("--compare", help="JSON of an earlier run, differences go to stderr")
+    parser.add_argument("--mock-oauth", type=int, metavar="PORT", help="serve app.test.mock_oauth here and bench login")
+    parser.add_argument("--oauth-latency-ms", type=float, default=0.0, help="mock round trip to Google")
+    parser.add_argument("--login-users", type=int, default=1000, help="login spreads over this many mock users")
+    parser.add_argument("--no-id-token", action="store_true", help="mock token responses without an id_token")
+    args = parser.parse_args()
+
+    routes = args.routes.split(",")
+    counts, blog_ids, refresh_tokens, access_token = prepare(args.seed, args.requests + args.warmup if "refresh" in routes else 0)
+    requests = route_requests(blog_ids, refresh_tokens, args.pages, args.login_users)
+    if args.mock_oauth:
+        mock_oauth.serve_in_thread(args.mock_oauth, args.oauth_latency_ms, id_token=not args.no_id_token)
+        url = mock_oauth.base_url(args.mock_oauth)
+        constants.GOOGLE_TOKEN_URL, constants.GOOGLE_USERINFO_URL = f"{url}/token", f"{url}/userinfo"
+        constants.GOOGLE_JWKS_URL = f"{url}/certs"
+        constants.GOOGLE_CLIENT_ID = constants.GOOGLE_CLIENT_ID or "mock-client-id" # the id_token audience
+        routes.append("login")
+    headers = {"Authorization": f"Bearer {access_token}"} if args.auth else {}
+
+    result = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "database": engine.dialect.name,
+        "rows": counts,
+        "concurrency": args.concurrency,
+        "auth": args.auth,
+        "routes": {},
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app): # view counter, login history writer... like a real worker
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=60) as client:
+            for route in routes:
+                result["routes"][route] = await bench_route(
+                    client, requests[route], args.requests, args.concurrency, args.warmup, args.seed)
+            result["outbound_http"] = http_client.stats()
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+if __name__ == "__main__":
+    asyncio.run(main())
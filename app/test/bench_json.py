@@ -0,0 +1,87 @@
+#run drkwon_backend>python -m app.test.bench_json --rows 100
+# Serialization cost per response schema in app.db.schemas, for a list of --rows validated models:
+#   stock:     model_dump(mode="json") -> jsonable_encoder -> json.dumps   (what FastAPI did for every response_model)
+#   dump_json: TypeAdapter(list[schema]).dump_json                         (fast_json.dump_models / FastAPI's fast path)
+#   orjson:    orjson.dumps(model_dump(mode="json")), only if orjson is installed
+# No database needed, rows are generated from each schema's field types.
+import argparse
+import inspect
+import json
+import timeit
+import types
+import typing
+from datetime import datetime
+
+import fastapi.routing
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.db import schemas
+from app.utils import fast_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def sample(annotation, name: str = "", depth: int = 0):
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        return sample(next(a for a in typing.get_args(annotation) if a is not type(None)), name, depth)
+    if origin is list:
+        return [sample(typing.get_args(annotation)[0], name, depth + 1) for _ in range(2)] if depth < 2 else []
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {field: sample(info.annotation, field, depth + 1) for field, info in annotation.model_fields.items()}
+    if annotation is bool:
+        return True
+    if annotation is int:
+        return 12345
+    if annotation is float:
+        return 4.25
+    if annotation is datetime:
+        return datetime(2025, 3, 27, 10, 30, 15)
+    if "content" in name:
+        return "Eye health tips for the whole family, with a few “quoted” words. " * 60 # ~4KB like a blog body
+    return f"{name} value"
+
+def response_schemas():
+    # the schemas that go out in responses: the from_attributes ones
+    for _, schema in inspect.getmembers(schemas, inspect.isclass):
+        if issubclass(schema, BaseModel) and schema.__module__ == schemas.__name__ and schema.model_config.get("from_attributes"):
+            yield schema
+
+def best_of(fn, repeat: int = 5) -> float:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    args = parser.parse_args()
+
+    fast_path = "dump_json" in inspect.signature(fastapi.routing.serialize_response).parameters
+    print(f"installed FastAPI serializes response_model bodies with dump_json: {fast_path}")
+    print(f"{'schema':28} {'bytes':>9} {'stock us':>10} {'dump_json us':>13} {'speedup':>8}" + (f" {'orjson us':>10}" if orjson else ""))
+
+    for schema in response_schemas():
+        adapter = fast_json.list_adapter(schema)
+        models = adapter.validate_python([sample(schema)] * args.rows)
+
+        def stock():
+            return json.dumps(jsonable_encoder(adapter.dump_python(models, mode="json")),
+                              ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+        def fast():
+            return adapter.dump_json(models)
+
+        assert json.loads(stock()) == json.loads(fast()), f"{schema.__name__}: outputs differ"
+        stock_s, fast_s = best_of(stock), best_of(fast)
+        line = f"{schema.__name__:28} {len(fast()):>9} {stock_s * 1e6:>10.0f} {fast_s * 1e6:>13.0f} {stock_s / fast_s:>7.1f}x"
+        if orjson:
+            line += f" {best_of(lambda: orjson.dumps(adapter.dump_python(models, mode='json'))) * 1e6:>10.0f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#run drkwon_backend>python -m app.test.bench_login --logins 500 --users 100
+# DB cost of one Google login, the old callback pipeline against crud_async.login_google_user (needs PostgreSQL):
+#   before: (sync crud, as the callback ran it) get_user_by_email, create_user (commit + refresh), update_user_refresh_token (get + commit + refresh),
+#           create_login_history (commit + refresh)
+#   after:  one upsert statement writing login_history and the user_sessions row from its RETURNING, one commit
+# Logins cycle over --users mock Google accounts (first login of each creates the user), run one after the other
+# so DB time isn't mixed with waiting. The bench users and their login_history rows are deleted afterwards (sessions cascade).
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import delete, event, select
+
+from app.db import crud, crud_async, models, query_log, schemas
+from app.db.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.test.mock_oauth import claims
+from app.utils import utils
+
+CLIENT_INFO = {"client_ip": "203.0.113.7", "user_agent": "Mozilla/5.0 (bench_login)", "device": "Other",
+               "location": '{"city": "Toronto", "region": "Ontario", "country": "Canada"}', "os": "Linux", "browser": "Chrome"}
+commits = []
+
+
+def user_info(prefix: str, number: int) -> dict:
+    info = claims(str(number))
+    return {**info, "sub": f"{prefix}-{info['sub']}", "email": f"{prefix}-{info['email']}"}
+
+def before_pipeline(info: dict):
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_email(db, info["email"])
+        if not user:
+            user = crud.create_user(db, schemas.UserCreate(
+                email=info["email"], password="", user_type="general", auth_method="google",
+                google_id=info["sub"], name=info["name"], picture=info["picture"]))
+        refresh_token = utils.create_refresh_token(user.user_id, user.email) # type: ignore
+        user = crud.update_user_refresh_token(db, user.user_id, refresh_token) # type: ignore
+        crud.create_login_history(db, {**CLIENT_INFO, "user_id": user.user_id})
+    finally:
+        db.close()
+
+async def before(info: dict):
+    # to_thread copies the context, so query_log still counts these statements for the login
+    await asyncio.to_thread(before_pipeline, info)
+
+async def after(info: dict):
+    async with AsyncSessionLocal() as db:
+        await crud_async.login_google_user(db, info, CLIENT_INFO)
+
+async def run(name: str, login, logins: int, users: int) -> dict:
+    db_ms, statements, wall_ms, commit_counts = [], [], [], []
+    for i in range(logins):
+        stats, token = query_log.start_request({"method": "LOGIN", "path": name})
+        commits.clear()
+        start = time.perf_counter()
+        await login(user_info(f"bench-{name}", i % users + 1))
+        wall_ms.append((time.perf_counter() - start) * 1000)
+        query_log.current_request.reset(token)
+        db_ms.append(stats.db_seconds * 1000)
+        statements.append(stats.db_statements)
+        commit_counts.append(len(commits))
+    return {
+        "logins": logins,
+        "db_ms_mean": round(statistics.mean(db_ms), 3),
+        "db_ms_p50": round(statistics.median(db_ms), 3),
+        "wall_ms_mean": round(statistics.mean(wall_ms), 3),
+        "statements_per_login": round(statistics.mean(statements), 2),
+        "commits_per_login": round(statistics.mean(commit_counts), 2),
+    }
+
+async def cleanup(prefix: str):
+    async with async_engine.begin() as conn:
+        user_ids = select(models.User.user_id).where(models.User.email.like(f"{prefix}-%"))
+        await conn.execute(delete(models.LoginHistory).where(models.LoginHistory.user_id.in_(user_ids)))
+        await conn.execute(delete(models.User).where(models.User.email.like(f"{prefix}-%")))
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    for sync_engine in (engine, async_engine.sync_engine):
+        query_log.instrument_engine(sync_engine)
+        event.listen(sync_engine, "commit", lambda conn: commits.append(1))
+    try:
+        for name, login in (("before", before), ("after", after)):
+            result = await run(name, login, args.logins, args.users)
+            print(f"{name:7} " + ", ".join(f"{key} {value}" for key, value in result.items()))
+    finally:
+        for name in ("before", "after"):
+            await cleanup(f"bench-{name}")
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+#run drkwon_backend>python -m app.test.explain_indexes
+# Runs the hot crud queries against a seeded PostgreSQL database, EXPLAINs the exact SQL they send
+# and checks every plan reads its table through the expected index instead of a Seq Scan.
+# Seed first (tiny tables are always seq scanned), then: alembic upgrade head
+import json
+import sys
+
+from sqlalchemy import event, func, text
+
+from app.db import crud, crud_async, models
+from app.db.database import SessionLocal, engine
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def capture(fn, db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    db.rollback()
+    return statements
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+def explain(db, statement, parameters):
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        return cursor.fetchone()[0][0]["Plan"]
+    finally:
+        cursor.close()
+
+def main():
+    db = SessionLocal()
+    try:
+        for table in ("blogs", "comments", "blog_reactions", "login_history", "user_sessions"):
+            db.execute(text(f"ANALYZE {table}"))
+        db.commit()
+
+        blog_id = db.query(func.max(models.Comment.blog_id)).scalar() or 1
+        user_id, reaction_blog_id = db.query(models.BlogReaction.user_id, models.BlogReaction.blog_id).first() or (1, 1)
+        history_user_id = db.query(func.max(models.LoginHistory.user_id)).scalar() or 1
+        token_hash = db.query(models.UserSession.token_hash).limit(1).scalar() or "0" * 64
+        first_page = crud.get_blogs(db, limit=10)
+        after = (first_page[-1].updated_at, first_page[-1].blog_id) if first_page else None
+
+        checks = [
+            ("get_blogs", lambda s: crud.get_blogs(s, limit=11), "blogs", "ix_blogs_listing"),
+            ("get_blogs cursor", lambda s: crud.get_blogs(s, limit=11, after=after), "blogs", "ix_blogs_listing"),
+            ("get_blogs visibility", lambda s: crud.get_blogs(s, "public", False, limit=11), "blogs", "ix_blogs_visibility_listing"),
+            ("get_comments_by_blog", lambda s: crud.get_comments_by_blog(s, blog_id), "comments", "ix_comments_blog_id_created_at"),
+            ("get_comment_threads", lambda s: crud.get_comment_threads(s, blog_id), "comments", "ix_comments_blog_threads"),
+            ("get_user_reaction", lambda s: crud.get_user_reaction(s, reaction_blog_id, user_id), "blog_reactions", "uq_blog_reactions_blog_id_user_id"),
+            ("get_login_history", lambda s: crud.get_login_history(s, history_user_id), "login_history", "ix_login_history_user_id_login_timestamp"),
+            # the /refresh UPDATE, rolled back after capture like every statement here
+            ("rotate_refresh_token", lambda s: s.execute(crud_async.ROTATE_REFRESH_TOKEN_SQL, {"token_hash": token_hash, "new_hash": "1" * 64}),
+             "user_sessions", "ix_user_sessions_token_hash"),
+        ]
+
+        failed = 0
+        for name, fn, table, index_name in checks:
+            for statement, parameters in capture(fn, db):
+                plan = explain(db, statement, parameters)
+                nodes = list(plan_nodes(plan))
+                if table not in {n.get("Relation Name") for n in nodes}:
+                    continue # a follow-up statement of fn on another table (e.g. selectinload of the users)
+                used = [n.get("Index Name") for n in nodes if n["Node Type"] in INDEX_SCANS]
+                # joined lookups (e.g. the author of each listed blog) may read small tables however the planner likes
+                seq_scans = [n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"]
+                ok = index_name in used and table not in seq_scans
+                failed += not ok
+                print(f"{'PASS' if ok else 'FAIL'} {name}: index scans {used}, seq scans {seq_scans}")
+                if not ok:
+                    print(json.dumps(plan, indent=2))
+        sys.exit(1 if failed else 0)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#run drkwon_backend>python -m app.test.id_token_check
+# Checks app.utils.google_id_token against a locally generated key set (no Google, no network):
+# a good token verifies, expired/foreign/tampered ones don't, and the key set is fetched once and
+# again only when a token names an unknown key id (Google rotating its keys).
+import asyncio
+import sys
+
+from jose.exceptions import JWTError
+
+from app.test.mock_oauth import generate_key_set, sign_id_token
+from app.utils import constants, google_id_token
+
+CLAIMS = {"sub": "mock-7", "email": "user7@example.com", "email_verified": True, "name": "Mock User 7",
+          "picture": "https://picsum.photos/seed/7/96"}
+
+
+async def main():
+    constants.GOOGLE_CLIENT_ID = "mock-client-id"
+    private_key, jwks = generate_key_set("key-1")
+    other_key, _ = generate_key_set("key-1") # same kid, different key
+    rotated_key, rotated_jwks = generate_key_set("key-2")
+    key_sets = [jwks]
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        return {"keys": [key for key_set in key_sets for key in key_set["keys"]]}, 3600
+
+    cache = google_id_token.JWKSCache(fetch)
+    token = lambda key=private_key, kid="key-1", **kw: sign_id_token(key, kid, CLAIMS, kw.pop("audience", "mock-client-id"), **kw)
+
+    checks = [
+        ("valid token", token(access_token="at-7"), "at-7", True),
+        ("valid token, no at_hash", token(), None, True),
+        ("expired", token(lifetime=-60), None, False),
+        ("other audience", token(audience="someone-else"), None, False),
+        ("signed by another key", token(key=other_key), None, False),
+        ("at_hash of another access token", token(access_token="at-7"), "at-8", False),
+        ("tampered", token()[:-4] + "AAAA", None, False),
+    ]
+    failures = 0
+    for name, id_token, access_token, expect_valid in checks:
+        try:
+            claims = await google_id_token.verify(id_token, access_token, cache)
+            valid = claims["email"] == CLAIMS["email"]
+        except JWTError:
+            valid = False
+        failures += valid != expect_valid
+        print(f"{'ok  ' if valid == expect_valid else 'FAIL'} {name}: {'verified' if valid else 'rejected'}")
+
+    print(f"{'ok  ' if len(fetches) == 1 else 'FAIL'} key set fetched {len(fetches)} time(s) for {len(checks)} tokens")
+    failures += len(fetches) != 1
+
+    # Google rotates: a new kid triggers one early refresh, an unknown kid right after can't trigger another
+    key_sets.append(rotated_jwks)
+    cache.fetched_at -= google_id_token.JWKS_MIN_REFRESH_SECONDS
+    rotated = await google_id_token.verify(token(key=rotated_key, kid="key-2"), None, cache)
+    try:
+        await google_id_token.verify(token(kid="key-unknown"), None, cache)
+        unknown_rejected = False
+    except JWTError:
+        unknown_rejected = True
+    rotation_ok = rotated["sub"] == CLAIMS["sub"] and unknown_rejected and len(fetches) == 2
+    failures += not rotation_ok
+    print(f"{'ok  ' if rotation_ok else 'FAIL'} key rotation: {len(fetches)} fetches, unknown kid rejected: {unknown_rejected}")
+
+    if failures:
+        print(f"FAIL: {failures} check(s)")
+        sys.exit(1)
+    print("PASS: id_token verification")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+#run drkwon_backend>python -m app.test.mock_oauth --port 9000 --latency-ms 40
+# Local stand-in for Google's OAuth endpoints, for tests and benchmarks of /login/google/callback without Google.
+# Point the backend at it (.env or environment):
+#   GOOGLE_AUTH_URL=http://127.0.0.1:9000/auth
+#   GOOGLE_TOKEN_URL=http://127.0.0.1:9000/token
+#   GOOGLE_USERINFO_URL=http://127.0.0.1:9000/userinfo
+#   GOOGLE_JWKS_URL=http://127.0.0.1:9000/certs
+# Any code is accepted, the code picks the user: code=user42 logs in user42@example.com (google_id mock-42),
+# so a benchmark can log in many different users. /auth redirects straight back with code=user1.
+# The token response has an id_token signed (RS256) with a key generated at startup, its JWK set is at /certs;
+# --no-id-token leaves it out, to bench the userinfo fallback.
+# --latency-ms delays every response like the round trip to Google would. GET /stats counts requests and
+# TCP connections seen, to check that the backend reuses its connections.
+import argparse
+import asyncio
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlencode
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response
+from jose import jwk, jwt
+
+ISSUER = "https://accounts.google.com"
+
+def generate_key_set(kid: str) -> tuple:
+    # (private key to sign with, public JWK set to verify with), like Google's /certs
+    # the private key is parsed once here, loading a PEM per signature costs more than the signing
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                            serialization.NoEncryption())
+    public_pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                       serialization.PublicFormat.SubjectPublicKeyInfo)
+    public_jwk = {**jwk.construct(public_pem, "RS256").to_dict(), "kid": kid, "use": "sig"}
+    return jwk.construct(private_pem, "RS256"), {"keys": [public_jwk]}
+
+def sign_id_token(private_key, kid: str, claims: dict, audience: str, access_token: str = None, # type: ignore
+                  lifetime: int = 3600) -> str:
+    now = int(time.time())
+    return jwt.encode({**claims, "iss": ISSUER, "aud": audience, "azp": audience, "iat": now, "exp": now + lifetime},
+                      private_key, algorithm="RS256", headers={"kid": kid}, access_token=access_token)
+
+app = FastAPI()
+app.state.latency = 0.0
+app.state.id_token = True
+KID = "mock-key-1"
+PRIVATE_KEY, JWKS = generate_key_set(KID)
+counts = {"token": 0, "userinfo": 0, "certs": 0, "connections": 0}
+connections = set()
+
+
+def user_number(code: str) -> str:
+    match = re.search(r"\d+", code)
+    return match.group() if match else "1"
+
+def claims(number: str) -> dict:
+    return {
+        "sub": f"mock-{number}",
+        "email": f"user{number}@example.com",
+        "email_verified": True,
+        "name": f"Mock User {number}",
+        "picture": f"https://picsum.photos/seed/{number}/96",
+    }
+
+@app.middleware("http")
+async def delay_and_count(request: Request, call_next):
+    client = request.scope.get("client")
+    if client and tuple(client) not in connections: # one (host, port) per TCP connection
+        connections.add(tuple(client))
+        counts["connections"] += 1
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+    return await call_next(request)
+
+@app.get("/auth")
+def auth(redirect_uri: str, state: str = None): # type: ignore
+    params = {"code": "user1"}
+    if state:
+        params["state"] = state
+    return RedirectResponse(f"{redirect_uri}?{urlencode(params)}")
+
+@app.post("/token")
+async def token(request: Request):
+    # form encoded like Google's token endpoint, parsed by hand (no python-multipart needed)
+    form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+    if form.get("grant_type") != "authorization_code" or not form.get("code"):
+        raise HTTPException(status_code=400, detail="invalid_grant")
+    counts["token"] += 1
+    number = user_number(form["code"])
+    access_token = f"mock-access-{number}"
+    response = {
+        "access_token": access_token,
+        "expires_in": 3599,
+        "scope": "openid email profile",
+        "token_type": "Bearer",
+    }
+    if app.state.id_token:
+        response["id_token"] = sign_id_token(PRIVATE_KEY, KID, claims(number), form.get("client_id", ""), access_token)
+    return response
+
+@app.get("/userinfo")
+def userinfo(request: Request):
+    authorization = request.headers.get("authorization", "")
+    if not authorization.startswith("Bearer mock-access-"):
+        raise HTTPException(status_code=401, detail="invalid_token")
+    counts["userinfo"] += 1
+    return claims(authorization.rsplit("-", 1)[-1])
+
+@app.get("/certs")
+def certs(response: Response):
+    counts["certs"] += 1
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return JWKS
+
+@app.get("/stats")
+def stats():
+    return counts
+
+
+def serve_in_thread(port: int, latency_ms: float = 0.0, id_token: bool = True):
+    # for benchmarks in the same process: uvicorn on a daemon thread, returns once it accepts connections
+    import uvicorn
+    app.state.latency = latency_ms / 1000
+    app.state.id_token = id_token
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="mock-oauth", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+def base_url(port: int) -> str:
+    return f"http://127.0.0.1:{port}"
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--no-id-token", action="store_true")
+    args = parser.parse_args()
+    app.state.latency = args.latency_ms / 1000
+    app.state.id_token = not args.no_id_token
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#run drkwon_backend>python -m app.test.query_counts
+# Calls the listing and search endpoints with growing page sizes and counts the SQL statements each request sends.
+# Every endpoint has to stay at the same count whatever the page size (no lazy loads per row, i.e. no N+1).
+# Needs a seeded database with more blogs/comments than the largest page size.
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.db import crud
+from app.db.database import engine
+from app.main import app
+
+PAGE_SIZES = (1, 5, 25, 100)
+
+ENDPOINTS = [
+    ("GET /blogs/", lambda n: f"/blogs/?per_page={n}"),
+    ("GET /blogs/ public", lambda n: f"/blogs/?visibility=public&per_page={n}"),
+    ("GET /search/ substring", lambda n: f"/search/?query=e&mode=substring&include_author=true&limit={n}"),
+]
+if engine.dialect.name == "postgresql":
+    ENDPOINTS.append(("GET /search/ fulltext", lambda n: f"/search/?query=eye&include_author=true&limit={n}"))
+
+
+def count_statements(client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    crud.blog_list_cache.clear() # measure the database path, not the listing cache
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    response.raise_for_status()
+    return len(statements), len(response.json())
+
+def main():
+    client = TestClient(app)
+    failed = 0
+    for name, url in ENDPOINTS:
+        counts = {n: count_statements(client, url(n)) for n in PAGE_SIZES}
+        ok = len({statements for statements, _ in counts.values()}) == 1
+        failed += not ok
+        detail = ", ".join(f"{rows} rows: {statements} statements" for statements, rows in counts.values())
+        print(f"{'PASS' if ok else 'FAIL'} {name}: {detail}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#run drkwon_backend>python -m app.test.reaction_concurrency --blog-id 1 --toggles 500 --threads 32
+# Fires hundreds of parallel like/dislike toggles at one blog through crud.create_or_update_reaction
+# and checks blogs.likes/dislikes still match the blog_reactions rows exactly (needs PostgreSQL).
+import argparse
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from app.db import crud, models, schemas
+from app.db.database import SessionLocal
+
+
+def counts(db, blog_id: int):
+    blog = db.get(models.Blog, blog_id)
+    db.refresh(blog)
+    rows = dict(
+        db.query(models.BlogReaction.reaction_type, func.count())
+        .filter(models.BlogReaction.blog_id == blog_id)
+        .group_by(models.BlogReaction.reaction_type)
+        .all()
+    )
+    return (
+        (blog.likes or 0) - rows.get(models.ReactionType.LIKE, 0),
+        (blog.dislikes or 0) - rows.get(models.ReactionType.DISLIKE, 0),
+    )
+
+def toggle(blog_id: int, user_id: int, reaction_type: str):
+    db = SessionLocal()
+    try:
+        crud.create_or_update_reaction(db, blog_id, user_id, schemas.BlogReactionCreate(reaction_type=reaction_type))
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blog-id", type=int, default=1)
+    parser.add_argument("--toggles", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--users", type=int, default=20, help="few users, so the same (blog, user) rows collide")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user_ids = [u for (u,) in db.query(models.User.user_id).limit(args.users)]
+        # counters may have started out of line with the rows (seeded data), only the offset must not move
+        before = counts(db, args.blog_id)
+    finally:
+        db.close()
+
+    rng = random.Random(7)
+    jobs = [(args.blog_id, rng.choice(user_ids), rng.choice(["like", "dislike"])) for _ in range(args.toggles)]
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(lambda job: toggle(*job), jobs))
+
+    db = SessionLocal()
+    try:
+        after = counts(db, args.blog_id)
+    finally:
+        db.close()
+
+    print(f"{args.toggles} toggles by {len(user_ids)} users on {args.threads} threads, counter - rows offset before {before} after {after}")
+    if before != after:
+        print("FAIL: blog counters drifted from blog_reactions")
+        sys.exit(1)
+    print("PASS: counters exact")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#run drkwon_backend>python -m app.test.seed_bulk --truncate --users 100000 --blogs 1000000 --comments 3000000 --reactions 5000000 --logins 2000000 --sessions 200000
+# Production sized, reproducible data for query plans and benchmarks (seed3_gemini.py does ~100 ORM objects).
+# - same --seed, same rows: Faker only fills small text pools once, rows are drawn from them with random.Random
+# - skew like the real site: a few prolific authors write most blogs, a few hot blogs get most comments/reactions,
+#   frequent users log in much more often (Zipf weights, --skew)
+# - every column the models only default in Python (allow_comments, report_count...) is written explicitly,
+#   COPY doesn't apply those defaults
+# - written in --batch sized COPY ... FROM STDIN (PostgreSQL, psycopg2 or psycopg 3), executemany elsewhere
+# - blog likes/dislikes are recomputed from the reactions at the end, so counters and rows agree
+import argparse
+import csv
+import io
+import itertools
+import json
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+
+from faker import Faker
+from sqlalchemy import func, insert, select, table, text
+
+from app.db import models
+from app.db.database import engine
+from app.utils import constants, utils
+
+END = datetime(2025, 6, 1) # fixed, not now(), so a seed always gives the same timestamps
+SPAN_SECONDS = 3 * 365 * 24 * 3600
+
+
+class Pools:
+    # Faker is far too slow per row at this size, draw from pre-generated text instead
+    def __init__(self, seed: int):
+        fake = Faker()
+        Faker.seed(seed)
+        self.sentences = [fake.sentence(nb_words=8) for _ in range(5000)]
+        self.paragraphs = [fake.paragraph(nb_sentences=6) for _ in range(2000)]
+        self.words = [fake.word() for _ in range(1000)]
+        self.names = [fake.name() for _ in range(5000)]
+        self.user_agents = [fake.user_agent() for _ in range(300)]
+        self.countries = [fake.country() for _ in range(200)]
+
+
+class Zipf:
+    # draws 1..n with P(k) ~ 1 / rank^s, ranks shuffled so the hot ids are spread out instead of being the first ones
+    def __init__(self, rng: random.Random, n: int, s: float):
+        self.rng = rng
+        self.ids = list(range(1, n + 1))
+        rng.shuffle(self.ids)
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+        self.total = self.cum_weights[-1]
+
+    def draw(self) -> int:
+        return self.ids[bisect(self.cum_weights, self.rng.random() * self.total)]
+
+
+class Loader:
+    def __init__(self, conn, batch: int):
+        self.conn = conn
+        self.batch = batch
+        self.postgres = conn.dialect.name == "postgresql"
+
+    def load(self, target, columns: list, rows):
+        total = 0
+        while True:
+            chunk = list(itertools.islice(rows, self.batch))
+            if not chunk:
+                return total
+            if self.postgres:
+                self.copy(target.name, columns, chunk)
+            else:
+                self.conn.execute(insert(target), [dict(zip(columns, row)) for row in chunk])
+            total += len(chunk)
+
+    def copy(self, table_name: str, columns: list, chunk: list):
+        # CSV: None -> unquoted empty field -> NULL
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(chunk)
+        statement = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        cursor = self.conn.connection.dbapi_connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"): # psycopg2
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
+            else: # psycopg 3
+                with cursor.copy(statement) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+
+def timestamp(rng: random.Random, after: datetime = END - timedelta(seconds=SPAN_SECONDS)) -> datetime:
+    span = max(1, int((END - after).total_seconds()))
+    return after + timedelta(seconds=rng.randrange(span))
+
+def user_rows(rng, pools, first_id: int, count: int):
+    for user_id in range(first_id, first_id + count):
+        created = timestamp(rng)
+        yield (
+            user_id, f"user{user_id}@example.com", rng.choices(("general", "od", "md", "admin"), (85, 7, 7, 1))[0],
+            "google", f"google-{user_id}", rng.choice(pools.names), f"https://picsum.photos/seed/{user_id}/96",
+            created, timestamp(rng, created), rng.random() < 0.005, rng.choice(("en", "es", "fr")), "approved",
+        )
+
+def blog_rows(rng, pools, authors: Zipf, first_id: int, count: int, created_at: dict):
+    for blog_id in range(first_id, first_id + count):
+        created = timestamp(rng)
+        created_at[blog_id] = created
+        title = rng.choice(pools.sentences)[:200]
+        yield (
+            blog_id, title, "\n\n".join(rng.sample(pools.paragraphs, rng.randint(2, 6))), round(rng.uniform(0, 5), 1),
+            rng.randint(0, 5000), authors.draw(), rng.choices(("public", "doctor"), (80, 20))[0], rng.random() < 0.03,
+            timestamp(rng, created) if rng.random() < 0.3 else created, created,
+            json.dumps(rng.sample(pools.words, rng.randint(1, 5))), f"https://picsum.photos/seed/b{blog_id}/800/400",
+            rng.choice(pools.sentences), rng.randint(1, 15), rng.choice(pools.words), title[:60],
+            rng.choice(pools.sentences), ", ".join(rng.sample(pools.words, 5)), f"blog-{blog_id}",
+            rng.choice(("en", "es", "fr")), timestamp(rng, created) if rng.random() < 0.02 else None, True,
+        )
+
+def comment_rows(rng, pools, blogs: Zipf, users: Zipf, first_id: int, count: int, blog_created_at: dict):
+    # a reply goes to an earlier comment of the same blog, so threads are real trees
+    recent = {}
+    for comment_id in range(first_id, first_id + count):
+        blog_id = blogs.draw()
+        earlier = recent.setdefault(blog_id, [])
+        parent = rng.choice(earlier) if earlier and rng.random() < 0.35 else None
+        earlier.append(comment_id)
+        if len(earlier) > 20:
+            earlier.pop(0)
+        yield (
+            comment_id, blog_id, users.draw(), rng.choice(pools.sentences) + " " + rng.choice(pools.sentences),
+            rng.random() < 0.01, timestamp(rng, blog_created_at[blog_id]), parent,
+            rng.randint(0, 50), rng.randint(0, 10), 0, None,
+        )
+
+def reaction_rows(rng, blogs: Zipf, users: Zipf, count: int):
+    # duplicates of (blog_id, user_id) are dropped on insert, see load_reactions (fewer rows than --reactions)
+    for _ in range(count):
+        yield (blogs.draw(), users.draw(), "LIKE" if rng.random() < 0.8 else "DISLIKE")
+
+def login_rows(rng, pools, users: Zipf, count: int):
+    for _ in range(count):
+        success = rng.random() < 0.95
+        yield (
+            users.draw(), timestamp(rng), f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            rng.choice(pools.user_agents), success, None if success else "invalid_grant",
+            rng.choice(("Other", "iPhone", "Samsung SM-G991B")),
+            json.dumps({"city": "Unknown", "region": "Unknown", "country": rng.choice(pools.countries)}),
+            rng.choice(("Windows", "Mac OS X", "Android", "iOS")), rng.choice(("Chrome", "Safari", "Firefox", "Edge")), False,
+        )
+
+def session_rows(rng, pools, users: Zipf, count: int):
+    # only token hashes are stored, the tokens are random and never known (like crud_async.login_google_user)
+    # expires_at follows the fixed END, so these sessions are long expired: rows for query plans, not logins
+    token_hash = lambda: utils.hash_refresh_token(f"{rng.getrandbits(256):064x}")
+    for _ in range(count):
+        created = timestamp(rng)
+        rotated = timestamp(rng, created) if rng.random() < 0.6 else None
+        revoked = rng.random() < 0.1
+        yield (
+            users.draw(), token_hash(), token_hash() if rotated else None, created, rotated or created, rotated,
+            created + timedelta(days=constants.REFRESH_TOKEN_EXPIRE_DAYS),
+            timestamp(rng, rotated or created) if revoked else None,
+            rng.choice(("logout", "logout_all", "reuse")) if revoked else None,
+            f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            rng.choice(pools.user_agents), rng.choice(("Other", "iPhone", "Samsung SM-G991B")),
+        )
+
+def load_reactions(conn, loader: Loader, rows):
+    columns = ["blog_id", "user_id", "reaction_type"]
+    if not loader.postgres:
+        total = 0
+        for chunk in iter(lambda: list(itertools.islice(rows, loader.batch)), []):
+            total += conn.execute(insert(models.BlogReaction.__table__).prefix_with("OR IGNORE"),
+                                  [dict(zip(columns, row)) for row in chunk]).rowcount
+        return total
+    # COPY can't skip conflicts: stage, then one INSERT ... ON CONFLICT DO NOTHING
+    conn.execute(text("CREATE TEMP TABLE seed_reactions (blog_id int, user_id int, reaction_type reactiontype) ON COMMIT DROP"))
+    loader.load(table("seed_reactions"), columns, rows)
+    return conn.execute(text(
+        "INSERT INTO blog_reactions (blog_id, user_id, reaction_type) SELECT blog_id, user_id, reaction_type "
+        "FROM seed_reactions ON CONFLICT (blog_id, user_id) DO NOTHING")).rowcount
+
+def next_id(conn, column) -> int:
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--blogs", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=300000)
+    parser.add_argument("--reactions", type=int, default=500000, help="before (blog, user) duplicates are dropped")
+    parser.add_argument("--logins", type=int, default=200000)
+    parser.add_argument("--sessions", type=int, default=20000, help="user_sessions rows, some rotated or revoked")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent, 0 = uniform")
+    parser.add_argument("--batch", type=int, default=50000, help="rows per COPY / executemany")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="empty the tables first (ids restart at 1)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    pools = Pools(args.seed)
+    rng = random.Random(args.seed)
+
+    def step(name, fn):
+        start = time.perf_counter()
+        count = fn()
+        print(f"{name:16} {count:>10} rows {time.perf_counter() - start:8.1f}s")
+
+    with engine.begin() as conn:
+        loader = Loader(conn, args.batch)
+        if args.truncate:
+            if loader.postgres:
+                conn.execute(text("TRUNCATE users, blogs, comments, blog_reactions, login_history, user_sessions, admin_actions RESTART IDENTITY CASCADE"))
+            else:
+                for name in ("admin_actions", "user_sessions", "login_history", "blog_reactions", "comments", "blogs", "users"):
+                    conn.execute(text(f"DELETE FROM {name}"))
+
+        first_user = next_id(conn, models.User.user_id)
+        first_blog = next_id(conn, models.Blog.blog_id)
+        first_comment = next_id(conn, models.Comment.comment_id)
+        # new rows only point at new users/blogs, so the Zipf ids are shifted past the existing ones
+        users = Zipf(rng, args.users, args.skew)
+        users.ids = [first_user - 1 + i for i in users.ids]
+        authors = Zipf(rng, min(args.users, max(1, args.users // 20)), args.skew) # 5% of users write
+        authors.ids = [first_user - 1 + i for i in authors.ids]
+        blog_created_at = {}
+
+        step("users", lambda: loader.load(models.User.__table__, [
+            "user_id", "email", "user_type", "auth_method", "google_id", "name", "picture",
+            "created_at", "last_login", "is_banned", "language", "verification_status"], user_rows(rng, pools, first_user, args.users)))
+        step("blogs", lambda: loader.load(models.Blog.__table__, [
+            "blog_id", "title", "content", "rating", "num_views", "author_id", "visibility", "is_hidden",
+            "updated_at", "created_at", "tags", "cover_image", "excerpt", "estimated_reading_time", "category",
+            "meta_title", "meta_description", "keywords", "slug", "language", "deleted_at", "allow_comments",
+        ], blog_rows(rng, pools, authors, first_blog, args.blogs, blog_created_at)))
+
+        blogs = Zipf(rng, args.blogs, args.skew)
+        blogs.ids = [first_blog - 1 + i for i in blogs.ids]
+        step("comments", lambda: loader.load(models.Comment.__table__, [
+            "comment_id", "blog_id", "user_id", "content", "is_hidden", "created_at", "parent_comment_id",
+            "likes", "dislikes", "report_count", "deleted_at",
+        ], comment_rows(rng, pools, blogs, users, first_comment, args.comments, blog_created_at)))
+        step("blog_reactions", lambda: load_reactions(conn, loader, reaction_rows(rng, blogs, users, args.reactions)))
+        step("login_history", lambda: loader.load(models.LoginHistory.__table__, [
+            "user_id", "login_timestamp", "ip_address", "user_agent", "is_success", "failure_reason",
+            "device_id", "location", "os", "browser", "two_factor_auth_used",
+        ], login_rows(rng, pools, users, args.logins)))
+        step("user_sessions", lambda: loader.load(models.UserSession.__table__, [
+            "user_id", "token_hash", "previous_token_hash", "created_at", "last_used_at", "rotated_at",
+            "expires_at", "revoked_at", "revoke_reason", "ip_address", "user_agent", "device_id",
+        ], session_rows(rng, pools, users, args.sessions)))
+
+        # counters from the rows, like create_or_update_reaction keeps them
+        conn.execute(text("""
+            UPDATE blogs SET
+                likes = (SELECT count(*) FROM blog_reactions r WHERE r.blog_id = blogs.blog_id AND r.reaction_type = 'LIKE'),
+                dislikes = (SELECT count(*) FROM blog_reactions r WHERE r.blog_id = blogs.blog_id AND r.reaction_type = 'DISLIKE')
+            WHERE blog_id >= :first_blog
+        """), {"first_blog": first_blog})
+
+        if loader.postgres:
+            # explicit ids were written, move the sequences past them
+            for name, column in (("users", "user_id"), ("blogs", "blog_id"), ("comments", "comment_id"),
+                                 ("blog_reactions", "reaction_id"), ("login_history", "login_id")):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{name}', '{column}'), "
+                                  f"coalesce((SELECT max({column}) FROM {name}), 1))"))
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
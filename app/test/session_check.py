@@ -0,0 +1,112 @@
+#run drkwon_backend>python -m app.test.session_check
+# Checks refresh token sessions end to end on the database in DATABASE_URL (needs PostgreSQL): two devices of one
+# user get their own sessions, /refresh rotates, a rotated token used again revokes the session (inside the reuse
+# grace it is only refused), /logout revokes, access tokens of revoked sessions are refused after the revocation
+# poll, and a refresh token from before user_sessions (a JWT in users.refresh_token) is refused.
+# The check users are deleted afterwards (their sessions and login_history rows with them).
+import asyncio
+import sys
+
+import httpx
+from sqlalchemy import delete, func, select, update
+
+from app.db import crud_async, models
+from app.db.database import AsyncSessionLocal, async_engine
+from app.db.security import get_current_user
+from app.db.session_revocations import session_revocations
+from app.main import app
+from app.test.mock_oauth import claims
+from app.utils import constants, utils
+
+CLIENT_INFO = {"client_ip": "203.0.113.9", "user_agent": "Mozilla/5.0 (session_check)", "device": "Other",
+               "location": None, "os": "Linux", "browser": "Chrome"}
+PREFIX = "session-check"
+failures = 0
+
+
+def check(name: str, ok: bool, detail=""):
+    global failures
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {name}{': ' + str(detail) if detail else ''}")
+
+async def login(number: int):
+    info = claims(str(number))
+    info = {**info, "sub": f"{PREFIX}-{info['sub']}", "email": f"{PREFIX}-{info['email']}"}
+    async with AsyncSessionLocal() as db:
+        return await crud_async.login_google_user(db, info, CLIENT_INFO)
+
+async def main():
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://check")
+    refresh = lambda token: client.post("/refresh", json={"refresh_token": token})
+    try:
+        laptop, laptop_token = await login(1)
+        phone, phone_token = await login(1)
+        check("two devices, two sessions", laptop.user_id == phone.user_id and laptop.session_id != phone.session_id)
+
+        response = await refresh(laptop_token)
+        laptop_token_2 = response.json().get("refresh_token")
+        check("refresh rotates", response.status_code == 200 and laptop_token_2 not in (None, laptop_token), response.status_code)
+        response = await refresh(phone_token)
+        phone_token = response.json().get("refresh_token")
+        check("other device unaffected", response.status_code == 200)
+
+        constants.REFRESH_REUSE_GRACE_SECONDS = 60
+        response = await refresh(laptop_token)
+        check("rotated token inside the grace: refused, session kept", response.status_code == 401
+              and (await refresh(laptop_token_2)).status_code == 200, response.json())
+
+        constants.REFRESH_REUSE_GRACE_SECONDS = 0
+        tablet, tablet_token = await login(1)
+        tablet_token_2 = (await refresh(tablet_token)).json()["refresh_token"]
+        response = await refresh(tablet_token)
+        check("rotated token reused: session revoked", response.status_code == 401
+              and (await refresh(tablet_token_2)).status_code == 401, response.json())
+
+        access_token = utils.create_access_token({"user_id": tablet.user_id, "user_type": "general", "sid": tablet.session_id})
+        check("access token of the reused session refused", get_current_user(access_token) is None)
+
+        desk, desk_token = await login(2)
+        desk_access = utils.create_access_token({"user_id": desk.user_id, "user_type": "general", "sid": desk.session_id})
+        check("access token of a live session accepted", get_current_user(desk_access) is not None)
+        response = await client.post("/logout", json={"refresh_token": desk_token})
+        check("logout", response.status_code == 200 and response.json()["revoked_sessions"] == 1
+              and (await refresh(desk_token)).status_code == 401, response.json())
+        check("access token refused after logout", get_current_user(desk_access) is None)
+
+        # revoked by another worker: only the poll brings it here
+        other, other_token = await login(3)
+        other_access = utils.create_access_token({"user_id": other.user_id, "user_type": "general", "sid": other.session_id})
+        async with async_engine.begin() as conn:
+            await conn.execute(update(models.UserSession).where(models.UserSession.session_id == other.session_id)
+                               .values(revoked_at=func.now(), revoke_reason="logout"))
+        before_poll = get_current_user(other_access) is not None
+        await session_revocations.poll()
+        check("revocation by another worker seen at the next poll", before_poll and get_current_user(other_access) is None)
+
+        response = await client.post("/logout", json={"refresh_token": phone_token, "all_devices": True})
+        check("logout on all devices", response.status_code == 200 and response.json()["revoked_sessions"] >= 2
+              and (await refresh(laptop_token_2)).status_code == 401, response.json())
+
+        legacy, _ = await login(4)
+        legacy_token = utils.create_refresh_token(legacy.user_id, legacy.email)
+        async with async_engine.begin() as conn:
+            await conn.execute(update(models.User).where(models.User.user_id == legacy.user_id).values(refresh_token=legacy_token))
+        response = await refresh(legacy_token)
+        check("refresh token from before sessions refused", response.status_code == 401, response.status_code)
+
+        check("unknown token", (await refresh("not-a-token")).status_code == 401)
+    finally:
+        await client.aclose()
+        async with async_engine.begin() as conn:
+            user_ids = select(models.User.user_id).where(models.User.email.like(f"{PREFIX}-%"))
+            await conn.execute(delete(models.LoginHistory).where(models.LoginHistory.user_id.in_(user_ids)))
+            await conn.execute(delete(models.User).where(models.User.email.like(f"{PREFIX}-%")))
+        await async_engine.dispose()
+
+    if failures:
+        print(f"FAIL: {failures} check(s)")
+        sys.exit(1)
+    print("PASS: refresh token sessions")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+# JSON straight to bytes through pydantic-core (Rust), no jsonable_encoder dict pass and no json.dumps
+# FastAPI already does this for routes with a response_model and the default response class, so keep those
+# as they are (setting response_class there turns the fast path off). This is for the rest:
+# - responses built by hand (cached pages, 304s...): dump_models(schema, rows)
+# - routes returning plain dicts/lists without a response_model: response_class=FastJSONResponse
+# Compare the paths with: python -m app.test.bench_json
+from functools import lru_cache
+from typing import Any, Iterable
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    # to_json knows datetimes, enums and models itself, so content needs no jsonable_encoder first
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: type[BaseModel]) -> TypeAdapter:
+    # building a TypeAdapter compiles a validator/serializer, do it once per schema
+    return TypeAdapter(list[schema])
+
+def dump_models(schema: type[BaseModel], rows: Iterable[Any]) -> bytes:
+    # ORM rows (or dicts) -> validated list[schema] -> JSON bytes, same output as response_model=list[schema]
+    adapter = list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
@@ -0,0 +1,152 @@
+# Offline IPv4 geolocation for login history (replaces the ipinfo.io call in utils.get_client_info)
+# The database is one binary file, memory-mapped read only and searched with bisect, so a lookup is
+# ~20 page reads and nothing is loaded into the heap. Build it from a CSV of IP ranges, e.g. DB-IP "IP to City Lite":
+#run drkwon_backend>python -m app.utils.geoip build dbip-city-lite.csv geoip.bin --columns start,end,,country,region,city
+#
+# File layout (big endian):
+#   header    MAGIC, range count (u32), location count (u32)
+#   ranges    range count x (start u32, end u32, location index u32), sorted by start, not overlapping
+#   offsets   (location count + 1) x u32 into the strings blob
+#   strings   utf-8 "city\tregion\tcountry" per location
+
+import argparse
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH", "geoip.bin")
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "4096"))
+
+MAGIC = b"GEOIPv4\x00"
+HEADER = struct.Struct(">8sII")
+RANGE = struct.Struct(">III")
+OFFSET = struct.Struct(">I")
+
+UNKNOWN = ("Unknown", "Unknown", "Unknown")
+
+
+class GeoIPDatabase:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.range_count, self.location_count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            self.mm.close()
+            raise ValueError(f"{path} is not a GeoIP database built by app.utils.geoip")
+        self.ranges_at = HEADER.size
+        self.offsets_at = self.ranges_at + self.range_count * RANGE.size
+        self.strings_at = self.offsets_at + (self.location_count + 1) * OFFSET.size
+
+    # bisect only needs len() and [i], so the start column is read straight from the mapping
+    def __len__(self):
+        return self.range_count
+
+    def __getitem__(self, i: int) -> int:
+        return RANGE.unpack_from(self.mm, self.ranges_at + i * RANGE.size)[0]
+
+    def location(self, index: int):
+        start, end = struct.unpack_from(">II", self.mm, self.offsets_at + index * OFFSET.size)
+        city, region, country = self.mm[self.strings_at + start:self.strings_at + end].decode().split("\t")
+        return (city or "Unknown", region or "Unknown", country or "Unknown")
+
+    def lookup(self, ip: int):
+        i = bisect_right(self, ip) - 1
+        if i < 0:
+            return UNKNOWN
+        start, end, index = RANGE.unpack_from(self.mm, self.ranges_at + i * RANGE.size)
+        if ip > end:
+            return UNKNOWN
+        return self.location(index)
+
+
+_db = None
+_db_lock = threading.Lock()
+_db_missing = False
+
+def get_database():
+    # opened on first use; a missing file only costs one warning, lookups then answer Unknown
+    global _db, _db_missing
+    if _db is None and not _db_missing:
+        with _db_lock:
+            if _db is None and not _db_missing:
+                try:
+                    _db = GeoIPDatabase(GEOIP_DB_PATH)
+                except (OSError, ValueError) as e:
+                    _db_missing = True
+                    logger.warning(f"GeoIP database unavailable, locations will be Unknown: {e}")
+    return _db
+
+@lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def lookup(client_ip: str):
+    # -> (city, region, country)
+    try:
+        ip = ipaddress.ip_address(client_ip)
+    except ValueError:
+        return UNKNOWN
+    if ip.version != 4 or not ip.is_global:
+        return UNKNOWN
+    db = get_database()
+    if db is None:
+        return UNKNOWN
+    return db.lookup(int(ip))
+
+
+def parse_ip(value: str) -> int:
+    # CSVs use either dotted quads or plain integers; IPv6 in either form raises ValueError (AddressValueError)
+    value = value.strip()
+    return int(ipaddress.IPv4Address(int(value) if value.isdigit() else value))
+
+def build(source: str, target: str, columns: list):
+    index = {name: i for i, name in enumerate(columns) if name}
+    locations = {}
+    ranges = []
+    with open(source, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            try:
+                start, end = parse_ip(row[index["start"]]), parse_ip(row[index["end"]])
+            except (ValueError, IndexError):
+                continue  # header line, IPv6 rows
+            place = "\t".join(row[index[name]].replace("\t", " ") if name in index else "" for name in ("city", "region", "country"))
+            ranges.append((start, end, locations.setdefault(place, len(locations))))
+    ranges.sort()
+
+    strings = [place.encode() for place in locations]
+    with open(target, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(ranges), len(strings)))
+        for r in ranges:
+            f.write(RANGE.pack(*r))
+        offset = 0
+        f.write(OFFSET.pack(offset))
+        for s in strings:
+            offset += len(s)
+            f.write(OFFSET.pack(offset))
+        for s in strings:
+            f.write(s)
+    print(f"{target}: {len(ranges)} ranges, {len(strings)} locations")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline GeoIP database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("source", help="CSV of IPv4 ranges")
+    b.add_argument("target", nargs="?", default=GEOIP_DB_PATH)
+    b.add_argument("--columns", default="start,end,country,region,city", help="CSV column names in order, blank to skip one")
+    q = sub.add_parser("lookup")
+    q.add_argument("ip")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.source, args.target, args.columns.split(","))
+    else:
+        print(lookup(args.ip))
+
+if __name__ == "__main__":
+    main()
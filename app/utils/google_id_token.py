@@ -0,0 +1,84 @@
+# Verifies the id_token of Google's token response locally, so a login needs no call to GOOGLE_USERINFO_URL
+# The id_token is a JWT signed (RS256) by one of Google's keys, published as a JWK set at GOOGLE_JWKS_URL.
+# - the key set is cached per worker for the Cache-Control max-age Google sends (GOOGLE_JWKS_TTL_SECONDS if none),
+#   fetched again once expired, or early when a token names a key id we don't have (Google rotated its keys)
+# - if a refresh fails the old keys are kept, the callback falls back to the userinfo call when verification fails
+# - checked: signature, exp, aud == GOOGLE_CLIENT_ID, iss is Google, at_hash against the access token
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Awaitable, Callable, Optional
+
+from jose import jwk, jwt
+from jose.exceptions import JWTError
+
+from app.utils import constants, http_client
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_JWKS_TTL_SECONDS = float(os.getenv("GOOGLE_JWKS_TTL_SECONDS", "3600")) # when the response has no max-age
+JWKS_MIN_REFRESH_SECONDS = 60 # unknown key ids can't make us fetch the key set more often than this
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+
+async def fetch_google_jwks() -> tuple:
+    # (JWK set, seconds it may be cached)
+    response = await http_client.get_client().get(constants.GOOGLE_JWKS_URL)
+    response.raise_for_status()
+    max_age = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+    return response.json(), float(max_age.group(1)) if max_age else GOOGLE_JWKS_TTL_SECONDS
+
+
+class JWKSCache:
+    def __init__(self, fetch: Callable[[], Awaitable[tuple]] = fetch_google_jwks):
+        self.fetch = fetch
+        self.keys: dict = {} # kid -> jose Key, parsed once
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self.lock = asyncio.Lock()
+        self.refreshes = 0
+        self.failed_refreshes = 0
+
+    async def refresh(self, force: bool = False):
+        async with self.lock: # one fetch for all the logins waiting on it
+            now = time.monotonic()
+            if now < self.expires_at and not force:
+                return
+            if force and now - self.fetched_at < JWKS_MIN_REFRESH_SECONDS:
+                return
+            self.fetched_at = now
+            try:
+                jwks, max_age = await self.fetch()
+                self.keys = {key["kid"]: jwk.construct(key, key.get("alg", "RS256")) for key in jwks["keys"]}
+                self.expires_at = now + max_age
+                self.refreshes += 1
+            except Exception as e: # keep the old keys, callers fall back to userinfo if they don't match
+                self.failed_refreshes += 1
+                logger.warning(f"Failed to refresh the Google JWK set: {e!r}")
+
+    async def get_key(self, kid: str):
+        if time.monotonic() >= self.expires_at:
+            await self.refresh()
+        if kid not in self.keys:
+            await self.refresh(force=True)
+        return self.keys.get(kid)
+
+    def stats(self) -> dict:
+        return {"keys": len(self.keys), "refreshes": self.refreshes, "failed_refreshes": self.failed_refreshes,
+                "expires_in_seconds": max(self.expires_at - time.monotonic(), 0)}
+
+
+jwks_cache = JWKSCache()
+
+async def verify(id_token: str, access_token: Optional[str] = None, cache: JWKSCache = jwks_cache) -> dict:
+    # the token's claims (sub, email, name, picture...) or JWTError
+    kid = jwt.get_unverified_header(id_token).get("kid")
+    key = await cache.get_key(kid) if kid else None
+    if key is None:
+        raise JWTError(f"Unknown signing key {kid!r}")
+    return jwt.decode(
+        id_token, key, algorithms=["RS256"], audience=constants.GOOGLE_CLIENT_ID, issuer=GOOGLE_ISSUERS,
+        access_token=access_token,
+    )
@@ -0,0 +1,38 @@
+# Conditional GET helpers: ETags from a few version fields and If-None-Match -> 304
+# The ETag is computed from values that change whenever the response body would (ids, updated_at, counters),
+# so the check can run on a small validator query instead of loading and serializing the full row.
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+BLOG_LIST_MAX_AGE = int(os.getenv("BLOG_LIST_MAX_AGE", "30")) # seconds shared caches may serve a public listing
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    # weak: the body may differ in details the ETag leaves out (W/"..." promises only an equivalent response)
+    raw = "|".join(p.isoformat() if isinstance(p, datetime) else str(p) for p in parts)
+    return ('W/"' if weak else '"') + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2), so W/"x" matches "x"
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def set_validators(response: Response, etag: str, cache_control: str, vary: Optional[str] = None):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if vary:
+        response.headers["Vary"] = vary
+
+def not_modified(etag: str, cache_control: str, vary: Optional[str] = None) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, cache_control, vary)
+    return response
@@ -0,0 +1,158 @@
+# Request metrics in Prometheus text format, served by GET /metrics in app.main
+# - MetricsMiddleware (plain ASGI, no BaseHTTPMiddleware): requests by route template and status, in-flight
+#   requests, latency histograms per route, DB time and statement count per request
+# - DB time and statements: counted by app.db.query_log for the request the middleware starts there
+#   (which also does the slow query log and the N+1 warnings)
+# - other stats (pool, caches, background writers) are read when /metrics is scraped, see add_collector
+# Per worker process: with several uvicorn workers each one has its own numbers, Prometheus sums them.
+# Cost per request: a few perf_counter calls and one short lock per metric, no allocation per bucket.
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from app.db import query_log
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# seconds, upper bounds like prometheus_client's defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {} # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = [(labels, list(series)) for labels, series in self.series.items()]
+        for labels, series in sorted(items):
+            base = format_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def inc(self, labels: tuple, value: float = 1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self, label_names: tuple) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.series.items())
+        lines += [f"{self.name}{{{format_labels(label_names, labels)}}} {value}" for labels, value in items]
+        return lines
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+ROUTE_LABELS = ("method", "route")
+requests_total = Counter("http_requests_total", "Requests by route template and status code.")
+requests_in_progress = 0 # gauge, only changed on the event loop
+request_seconds = Histogram("http_request_duration_seconds", "Time until the response is fully sent.", LATENCY_BUCKETS)
+request_db_seconds = Histogram("http_request_db_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS)
+request_db_statements = Histogram("http_request_db_statements", "SQL statements executed per request.", QUERY_COUNT_BUCKETS)
+
+collectors: list = [] # (prefix, function returning a dict of numbers)
+
+def add_collector(prefix: str, collect: Callable[[], dict]):
+    # collect() is called on every scrape, nested dicts become name_part_part, non-numbers are skipped
+    collectors.append((prefix, collect))
+
+def flatten(prefix: str, stats: dict):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from flatten(name, value)
+        elif isinstance(value, (bool, int, float)):
+            yield name, float(value)
+
+def render() -> str:
+    lines = requests_total.render(ROUTE_LABELS + ("status",))
+    lines += [
+        "# HELP http_requests_in_progress Requests currently being handled.",
+        "# TYPE http_requests_in_progress gauge",
+        f"http_requests_in_progress {requests_in_progress}",
+    ]
+    lines += request_seconds.render(ROUTE_LABELS)
+    lines += request_db_seconds.render(ROUTE_LABELS)
+    lines += request_db_statements.render(ROUTE_LABELS)
+    for prefix, collect in collectors:
+        for name, value in flatten(prefix, collect()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def route_template(scope) -> str:
+    # the path with {placeholders} (/blogs/{blog_id}), so ids don't blow up the number of series
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app, skip_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        global requests_in_progress
+        stats, token = query_log.start_request(scope)
+        status = 500 # if the app raises before sending anything
+        requests_in_progress += 1
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_progress -= 1
+            query_log.finish_request(stats, token)
+            labels = (scope["method"], route_template(scope))
+            requests_total.inc(labels + (status,))
+            request_seconds.observe(labels, elapsed)
+            request_db_seconds.observe(labels, stats.db_seconds)
+            request_db_statements.observe(labels, stats.db_statements)
@@ -0,0 +1,181 @@
+# On-demand sampling profiler, only installed when ENVIRONMENT != "production" (like /docs, see app.main)
+# - one request: add ?profile=1 or the header "X-Profile: 1", the response is replaced by the profile of that
+#   request as a collapsed stack file (one "frame;frame;frame count" line per stack), open it in
+#   https://www.speedscope.app or turn it into an SVG with flamegraph.pl. The real status is in X-Profile-Status.
+# - many requests: arm a route with POST /debug/profiles (app/routers/profiling.py), the next N requests to it are
+#   sampled and summed into one collapsed file, e.g. while python -m app.test.bench_http drives the route
+# A thread samples sys._current_frames() every PROFILE_INTERVAL_MS: the event loop thread (async routes, JSON
+# rendering, middleware) and the threadpool workers (sync routes, Pydantic validation, SQLAlchemy). It samples
+# the whole worker process, so concurrent requests show up in each other's profile: use a quiet staging worker.
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi.responses import Response
+
+from app.utils.metrics import route_template
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2")) # below sys.getswitchinterval() (5 ms) adds little
+PROFILE_MAX_REQUESTS = 1000 # per armed route
+EVENT_LOOP_WAITING = "(event loop waiting for I/O)"
+WORKER_THREAD_NAME = "AnyIO worker thread"
+
+
+def frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_qualname}"
+
+def collapse(frame) -> Optional[str]:
+    # root first, frames joined by ";" (collapsed stack format); None for an idle threadpool worker
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    if len(names) >= 3 and names[-2] == "queue.Queue.get" and names[-3].endswith("WorkerThread.run"):
+        return None
+    if names[-1].startswith("selectors."):
+        return EVENT_LOOP_WAITING # awaiting the database, the client... kept, it is part of the wall time
+    return ";".join(names)
+
+
+class Sampler:
+    def __init__(self, loop_thread: int, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="profile-sampler", daemon=True)
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def run(self):
+        own = threading.get_ident()
+        while not self.stopping.wait(self.interval):
+            workers = {t.ident for t in threading.enumerate() if t.name.startswith(WORKER_THREAD_NAME)}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (ident != self.loop_thread and ident not in workers):
+                    continue
+                stack = collapse(frame)
+                if stack is not None:
+                    self.stacks[stack] += 1
+            self.samples += 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self.thread.join()
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+
+def render(stacks: Counter) -> bytes:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()).encode()
+
+def file_name(method: str, route: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", f"{method} {route}").strip("-") + ".collapsed"
+
+
+class RouteProfile:
+    # the next `remaining` requests to one route, summed
+    def __init__(self, method: str, route: str, requests: int):
+        self.method = method
+        self.route = route
+        self.remaining = requests
+        self.requests = 0
+        self.samples = 0
+        self.seconds = 0.0
+        self.stacks: Counter = Counter()
+
+    def add(self, sampler: Sampler):
+        self.remaining -= 1
+        self.requests += 1
+        self.samples += sampler.samples
+        self.seconds += sampler.seconds
+        self.stacks.update(sampler.stacks)
+
+    def summary(self) -> dict:
+        return {"method": self.method, "route": self.route, "requests": self.requests, "remaining": self.remaining,
+                "samples": self.samples, "seconds": round(self.seconds, 3)}
+
+
+lock = threading.Lock()
+route_profiles: dict = {} # (method, route template) -> RouteProfile
+
+def arm(method: str, route: str, requests: int) -> RouteProfile:
+    with lock:
+        profile = route_profiles[(method.upper(), route)] = RouteProfile(method.upper(), route, min(requests, PROFILE_MAX_REQUESTS))
+        return profile
+
+def get_profile(method: str, route: str) -> Optional[RouteProfile]:
+    with lock:
+        return route_profiles.get((method.upper(), route))
+
+def reset(method: Optional[str] = None, route: Optional[str] = None):
+    with lock:
+        for key in [k for k in route_profiles if (method is None or k[0] == method.upper()) and (route is None or k[1] == route)]:
+            del route_profiles[key]
+
+def armed() -> bool:
+    with lock:
+        return any(profile.remaining > 0 for profile in route_profiles.values())
+
+
+def profile_requested(scope) -> bool:
+    if any(name == b"x-profile" and value not in (b"", b"0") for name, value in scope["headers"]):
+        return True
+    return re.search(rb"(?:^|&)profile=(?!0(?:&|$))[^&]", scope.get("query_string", b"")) is not None
+
+
+class ProfileMiddleware:
+    def __init__(self, app, skip_prefix: str = "/debug/profiles"):
+        self.app = app
+        self.skip_prefix = skip_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_prefix):
+            await self.app(scope, receive, send)
+            return
+        single = profile_requested(scope)
+        if not single and not armed():
+            await self.app(scope, receive, send)
+            return
+
+        sampler = Sampler(threading.get_ident()).start()
+        if not single:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                sampler.stop()
+                with lock:
+                    profile = route_profiles.get((scope["method"], route_template(scope)))
+                    if profile is not None and profile.remaining > 0:
+                        profile.add(sampler)
+            return
+
+        # swallow the real response, send the profile instead
+        status = 500
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            sampler.stop()
+        response = Response(render(sampler.stacks), media_type="text/plain", headers={
+            "Content-Disposition": f'attachment; filename="{file_name(scope["method"], route_template(scope))}"',
+            "X-Profile-Status": str(status),
+            "X-Profile-Samples": str(sampler.samples),
+            "X-Profile-Duration-Ms": f"{sampler.seconds * 1000:.1f}",
+        })
+        await response(scope, receive, send)
@@ -0,0 +1,47 @@
+# NDJSON streaming responses: one JSON object per line, sent as soon as it is produced
+# The rows come from a sync generator that owns its own session (the request's get_db session is closed
+# before a streamed body is sent) and reads through a server-side cursor, see crud.stream_* and yield_per.
+# When the client goes away Starlette cancels the stream and the generator is closed, which ends the query.
+import os
+from typing import Callable, Iterator
+
+import anyio
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+
+STREAM_MAX_ROWS = int(os.getenv("STREAM_MAX_ROWS", "10000")) # hard cap for any streamed response
+STREAM_YIELD_PER = int(os.getenv("STREAM_YIELD_PER", "500")) # rows fetched from the server-side cursor at a time
+
+
+def session_rows(produce: Callable[..., Iterator[BaseModel]], *args, max_rows: int = STREAM_MAX_ROWS) -> Iterator[BaseModel]:
+    db = SessionLocal()
+    produced = produce(db, *args)
+    try:
+        for count, row in enumerate(produced, start=1):
+            yield row
+            if count >= max_rows:
+                break
+    finally:
+        produced.close()
+        db.close()
+
+async def ndjson_lines(rows: Iterator[BaseModel]):
+    try:
+        # each next() runs in the threadpool, the event loop only sends the lines
+        async for row in iterate_in_threadpool(rows):
+            yield row.model_dump_json() + "\n"
+    finally:
+        # also runs when the stream is cancelled (client disconnect): stop the query, give back the connection
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(rows.close)
+
+def ndjson_response(produce: Callable[[Session], Iterator[BaseModel]], *args, max_rows: int = STREAM_MAX_ROWS) -> StreamingResponse:
+    return StreamingResponse(
+        ndjson_lines(session_rows(produce, *args, max_rows=max_rows)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}, # nginx: pass lines through instead of buffering the body
+    )
@@ -1,13 +1,16 @@
 # see for more info from https://www.perplexity.ai/search/in-fastapi-python-encoded-jwt-FxGI_2uNRyqluZYPQCMTpw
+import base64
+import hashlib
 import json
+import secrets
 from fastapi import Request
 from jose import jwt
 from datetime import datetime, timedelta, timezone
-#import secrets
 from app.utils import constants
 
-import requests
+from functools import lru_cache
 from user_agents import parse
+from app.utils import geoip
 
 '''
 SECRET_KEY = secrets.token_hex(32)
@@ -37,6 +40,7 @@ def create_access_token(user_info_from_db: dict, expires_delta: timedelta = None
     encoded_jwt = jwt.encode(to_encode, constants.SECRET_KEY, algorithm=constants.ALGORITHM) # type: ignore
     return encoded_jwt
 
+# the refresh token before user_sessions (a JWT kept in users.refresh_token), /refresh no longer accepts it
 def create_refresh_token(user_id: int, email: str, expires_delta: timedelta = None):
     now = datetime.now(timezone.utc)
     if expires_delta:
@@ -48,7 +52,44 @@ def create_refresh_token(user_id: int, email: str, expires_delta: timedelta = No
     encoded_jwt = jwt.encode(to_encode, constants.SECRET_KEY, algorithm=constants.ALGORITHM)  # type: ignore
     return encoded_jwt
 
+# Refresh tokens of user_sessions: random and opaque, the server keeps only their SHA-256
+# (a salt isn't needed, 256 random bits can't be guessed from a table of hashes)
+def new_refresh_token() -> tuple:
+    # (token for the client, hash to store)
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
 
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# Opaque keyset cursor, e.g. (updated_at, blog_id) of the last row of a page -> url safe string
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    # raises ValueError for anything that wasn't made by encode_cursor
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+
+# The same few browsers log in over and over, parse each user agent string once
+@lru_cache(maxsize=1024)
+def parse_user_agent(user_agent: str):
+    parsed_ua = parse(user_agent)
+    return (
+        parsed_ua.device.family or "Unknown",
+        parsed_ua.browser.family or "Unknown",
+        parsed_ua.os.family or "Unknown",
+    )
+
+# Blocking (file reads), call it through run_in_threadpool from async code
 def get_client_info(request: Request):
     # Extract client IP address
     client_ip = request.client.host # type: ignore
@@ -57,21 +98,11 @@ def get_client_info(request: Request):
     user_agent = request.headers.get("user-agent", "Unknown")
 
     # Parse user agent details
-    parsed_ua = parse(user_agent)
-    device = parsed_ua.device.family or "Unknown"
-    browser = parsed_ua.browser.family or "Unknown"
-    os = parsed_ua.os.family or "Unknown"
+    device, browser, os = parse_user_agent(user_agent)
 
-    # Get approximate geolocation (optional)
-    try:
-        geo_info = requests.get(f"https://ipinfo.io/{client_ip}/json", timeout=3).json()
-        location = {
-            "city": geo_info.get("city", "Unknown"),
-            "region": geo_info.get("region", "Unknown"),
-            "country": geo_info.get("country", "Unknown"),
-        }
-    except requests.RequestException:
-        location = {"city": "Unknown", "region": "Unknown", "country": "Unknown"}
+    # Approximate geolocation from the local GeoIP file, no network call
+    city, region, country = geoip.lookup(client_ip)
+    location = {"city": city, "region": region, "country": country}
 
     # Return all info in a dictionary
     return {